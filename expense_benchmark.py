@@ -0,0 +1,270 @@
+"""Synthetic ledgers and a benchmark harness for ExpenseTracker.
+
+Generates ledgers of a given size (kept in --data-dir so large ones are only
+built once), times the tracker's main operations against each and writes the
+results as JSON. Pass --baseline with an earlier results file to flag
+operations that got slower.
+
+Every run also times `import expense_tracker` in fresh interpreters with
+-X importtime and fails if plotting or Excel libraries load at import time.
+`--sizes` with no values runs only that check, which is cheap enough for CI.
+
+    python expense_benchmark.py --sizes 10000 1000000
+    python expense_benchmark.py --sizes 10000000 --output bench.json
+    python expense_benchmark.py --sizes 10000 --baseline bench.json
+    python expense_benchmark.py --sizes
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from expense_tracker import ExpenseTracker
+
+PAYMENT_METHODS = ('Cash', 'Credit Card', 'Debit Card', 'Mobile Payment', 'Bank Transfer')
+DEFAULT_SIZES = (10_000, 1_000_000, 10_000_000)
+OPERATIONS = (
+    'get_expenses_dataframe', 'get_monthly_summary', 'get_budget_analysis',
+    'get_spending_trends', 'export_to_excel', 'add_expense',
+)
+# Writing an .xlsx takes minutes per million rows, so larger ledgers skip it unless asked
+EXPORT_MAX_ROWS = 1_000_000
+# Packages expense_tracker must only import on first use (pyarrow is left out: pandas loads it)
+LAZY_PACKAGES = ('matplotlib', 'seaborn', 'openpyxl', 'xlsxwriter')
+
+
+# ---------- Synthetic data ----------
+def generate_expenses(rows, categories=ExpenseTracker.CATEGORIES, payment_methods=PAYMENT_METHODS,
+                      start_date=None, end_date=None, seed=0, chunk_size=ExpenseTracker.BULK_CHUNK_SIZE):
+    """Yield DataFrame chunks of random expenses in the bulk import layout, amounts in int64 cents.
+
+    Dates are spread uniformly over [start_date, end_date] (the two years up
+    to today by default) and each category gets its own typical amount, so
+    per-category reports look like a real ledger rather than flat noise.
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end_date or date.today())
+    start = pd.Timestamp(start_date) if start_date else end - pd.DateOffset(years=2)
+    span_days = (end - start).days + 1
+
+    categories = np.asarray(categories, dtype=object)
+    payment_methods = np.asarray(payment_methods, dtype=object)
+    typical_amount = rng.uniform(5, 150, size=len(categories))
+    merchants = np.array([f"Merchant {i}" for i in range(500)], dtype=object)
+
+    for offset in range(0, rows, chunk_size):
+        n = min(chunk_size, rows - offset)
+        category_idx = rng.integers(len(categories), size=n)
+        amount_cents = np.rint(rng.lognormal(np.log(typical_amount[category_idx] * 100), 0.6)).astype('int64')
+        dates = start + pd.to_timedelta(rng.integers(span_days, size=n), unit='D')
+        yield pd.DataFrame({
+            'amount_cents': amount_cents,
+            'category': categories[category_idx],
+            'description': merchants[rng.integers(len(merchants), size=n)],
+            'date': dates.strftime('%Y-%m-%d'),
+            'payment_method': payment_methods[rng.integers(len(payment_methods), size=n)],
+        })
+
+
+def build_ledger(db_file, rows, seed=0, **generator_options):
+    """Create (or reuse) a ledger holding exactly `rows` synthetic expenses plus current budgets"""
+    db_file = Path(db_file)
+    if db_file.exists():
+        with sqlite3.connect(db_file) as conn:
+            if conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0] == rows:
+                return 0.0
+        db_file.unlink()
+
+    started = time.perf_counter()
+    with ExpenseTracker(str(db_file), cache_size=0, verbose=False) as tracker:
+        for chunk in generate_expenses(rows, seed=seed, **generator_options):
+            tracker.add_expenses_bulk(chunk)
+        month_year = datetime.now().strftime('%Y-%m')
+        for category in tracker.categories:
+            tracker.set_budget(category, 500, month_year)
+    return time.perf_counter() - started
+
+
+# ---------- Benchmarks ----------
+def _time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def _bench_add_expense(tracker, count):
+    """Time `count` single-row inserts, then remove them so the ledger stays at its nominal size"""
+    conn = tracker._connect()
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM expenses").fetchone()[0]
+    today = datetime.now().strftime('%Y-%m-%d')
+    timings = _time(lambda: tracker.add_expense(12.5, 'Food & Dining', 'benchmark', today), count)
+    with tracker.transaction() as conn:
+        conn.execute("DELETE FROM expenses WHERE id > ?", (last_id,))
+    return timings
+
+
+def run_benchmarks(db_file, rows, operations=OPERATIONS, repeat=3, inserts=200, work_dir=None):
+    """Time each operation against one ledger and return a list of result dicts.
+
+    The tracker's report cache is disabled, so every repeat measures a full
+    computation rather than a cache hit.
+    """
+    now = datetime.now()
+    month_year = now.strftime('%Y-%m')
+    work_dir = Path(work_dir or tempfile.gettempdir())
+    cases = {
+        'get_expenses_dataframe': lambda t: t.get_expenses_dataframe(),
+        'get_monthly_summary': lambda t: t.get_monthly_summary(now.year, now.month),
+        'get_budget_analysis': lambda t: t.get_budget_analysis(month_year),
+        'get_spending_trends': lambda t: t.get_spending_trends(6),
+        'export_to_excel': lambda t: t.export_to_excel(str(work_dir / f"benchmark-{rows}.xlsx")),
+    }
+
+    results = []
+    with ExpenseTracker(str(db_file), cache_size=0, verbose=False) as tracker:
+        for operation in operations:
+            if operation == 'add_expense':
+                timings = _bench_add_expense(tracker, inserts)
+            else:
+                timings = _time(lambda: cases[operation](tracker), repeat)
+            results.append({
+                'rows': rows,
+                'operation': operation,
+                'repeat': len(timings),
+                'min_seconds': round(min(timings), 6),
+                'median_seconds': round(float(np.median(timings)), 6),
+                'max_seconds': round(max(timings), 6),
+            })
+    (work_dir / f"benchmark-{rows}.xlsx").unlink(missing_ok=True)
+    return results
+
+
+def measure_startup(module='expense_tracker', runs=5):
+    """Time `import module` in fresh interpreters using -X importtime.
+    
+    Returns a result dict like run_benchmarks' (with rows=0) plus the
+    LAZY_PACKAGES the import pulled in, which should be none.
+    """
+    timings = []
+    eager = set()
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=Path(__file__).resolve().parent, capture_output=True, text=True, check=True
+        )
+        # Lines look like "import time:  self [us] | cumulative | package", innermost first
+        for line in completed.stderr.splitlines():
+            _, _, rest = line.partition('import time:')
+            fields = [field.strip() for field in rest.split('|')]
+            if len(fields) != 3 or not fields[1].isdigit():
+                continue
+            package = fields[2]
+            if package.split('.')[0] in LAZY_PACKAGES:
+                eager.add(package.split('.')[0])
+            if package == module:
+                timings.append(int(fields[1]) / 1e6)
+    return {
+        'rows': 0,
+        'operation': f'import {module}',
+        'repeat': len(timings),
+        'min_seconds': round(min(timings), 6),
+        'median_seconds': round(float(np.median(timings)), 6),
+        'max_seconds': round(max(timings), 6),
+        'eager_imports': sorted(eager),
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+
+def compare_results(baseline, current, tolerance=0.2):
+    """Return the operations whose median time grew by more than `tolerance` over the baseline"""
+    previous = {(r['rows'], r['operation']): r['median_seconds'] for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        before = previous.get((result['rows'], result['operation']))
+        if before and result['median_seconds'] > before * (1 + tolerance):
+            regressions.append({
+                'rows': result['rows'],
+                'operation': result['operation'],
+                'baseline_seconds': before,
+                'median_seconds': result['median_seconds'],
+                'change': round(result['median_seconds'] / before - 1, 3),
+            })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ExpenseTracker on synthetic ledgers")
+    parser.add_argument('--sizes', type=int, nargs='*', default=DEFAULT_SIZES,
+                        help="ledger sizes in rows (none to run only the startup check)")
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS,
+                        help=f"operations to run (default: all; export only up to {EXPORT_MAX_ROWS:,} rows)")
+    parser.add_argument('--skip', nargs='+', choices=OPERATIONS, default=(), help="operations to leave out")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per read/report operation")
+    parser.add_argument('--inserts', type=int, default=200, help="single-row inserts timed by add_expense")
+    parser.add_argument('--data-dir', default='benchmark_ledgers', help="where generated ledgers are kept")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write JSON results here instead of stdout")
+    parser.add_argument('--baseline', help="earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown before flagging")
+    parser.add_argument('--startup-runs', type=int, default=5, help="fresh interpreters timed for import cost")
+    args = parser.parse_args(argv)
+
+    data_dir = Path(args.data_dir)
+    if args.sizes:
+        data_dir.mkdir(parents=True, exist_ok=True)
+    report = {'generated_at': datetime.now().isoformat(timespec='seconds'),
+              'environment': environment(), 'ledgers': [], 'results': []}
+
+    startup = measure_startup(runs=args.startup_runs)
+    report['results'].append(startup)
+    if startup['eager_imports']:
+        print(f"expense_tracker imports {', '.join(startup['eager_imports'])} at startup", file=sys.stderr)
+
+    for rows in args.sizes:
+        operations = [op for op in (args.operations or OPERATIONS) if op not in args.skip]
+        if args.operations is None and rows > EXPORT_MAX_ROWS:
+            operations = [op for op in operations if op != 'export_to_excel']
+        db_file = data_dir / f"ledger-{rows}-seed{args.seed}.db"
+        print(f"Preparing {rows:,}-row ledger...", file=sys.stderr)
+        build_seconds = build_ledger(db_file, rows, seed=args.seed)
+        report['ledgers'].append({'rows': rows, 'file': str(db_file),
+                                  'build_seconds': round(build_seconds, 3)})
+        print(f"Benchmarking {rows:,} rows: {', '.join(operations)}", file=sys.stderr)
+        report['results'].extend(run_benchmarks(db_file, rows, operations, args.repeat, args.inserts, data_dir))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare_results(json.load(f), report, args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    if report.get('regressions') or startup['eager_imports']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""Local HTTP/JSON service hosting many expense ledgers.
+
+Each ledger is its own SQLite file in the data directory. Writes to a ledger
+run one at a time on that ledger's writer thread in the server process; report
+reads run in a pool of worker processes so pandas work never blocks the request
+threads.
+
+    python expense_service.py serve --data-dir ledgers --port 8765
+    python expense_service.py bench --requests 2000 --concurrency 16
+
+Endpoints (ledger names are letters, digits, '-' and '_'):
+    POST   /ledgers/<name>/expenses       {"amount", "category", "description", "date", "payment_method", "currency"}
+    DELETE /ledgers/<name>/expenses/<id>
+    PUT    /ledgers/<name>/budgets        {"category", "amount", "month_year", "currency"}
+    GET    /ledgers/<name>/summary?year=&month=&currency=
+    GET    /ledgers/<name>/budget?month_year=&currency=
+    GET    /ledgers/<name>/trends?months=&currency=
+
+A ledger is created by its first POST or PUT; reports and deletes on a ledger
+that does not exist yet return 404. Reports in a currency other than an
+amount's own need --fx-rates.
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from expense_tracker import ExpenseTracker, frame_to_records
+
+LEDGER_NAME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+ROUTE = re.compile(r'^/ledgers/([^/]+)/(expenses|budgets|summary|budget|trends)(?:/(\d+))?$')
+
+# Report methods the worker pool may run, with how to convert query parameters
+REPORTS = {
+    'summary': ('get_monthly_summary', {'year': int, 'month': int, 'currency': str}),
+    'budget': ('get_budget_analysis', {'month_year': str, 'currency': str}),
+    'trends': ('get_spending_trends', {'months': int, 'currency': str}),
+}
+
+
+# ---------- Worker processes ----------
+# Each worker keeps one tracker per ledger so its report cache survives between
+# requests; the tracker notices commits from the server process and drops stale entries.
+_worker_trackers = {}
+
+
+def _run_report(db_file, fx_rates_file, method, kwargs):
+    tracker = _worker_trackers.get(db_file)
+    if tracker is None:
+        tracker = _worker_trackers[db_file] = ExpenseTracker(db_file, verbose=False, fx_rates_file=fx_rates_file)
+    result = getattr(tracker, method)(**kwargs)
+
+    if result is None:
+        return {'rows': []}
+    if isinstance(result, tuple):
+        monthly, by_category = result
+        return {'monthly': frame_to_records(monthly), 'by_category': frame_to_records(by_category)}
+    return {'rows': frame_to_records(result)}
+
+
+# ---------- Server ----------
+class LedgerNotFound(LookupError):
+    pass
+
+
+class LedgerRegistry:
+    """Opens ledgers on demand and runs each ledger's writes on its own writer thread"""
+
+    def __init__(self, data_dir, workers=None, fx_rates_file=None):
+        self.data_dir = Path(data_dir)
+        self.fx_rates_file = fx_rates_file
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        # Workers start lazily from a threaded server, so fork() could copy held locks; spawn instead
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        self._ledgers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, create=True):
+        """Return (tracker, writer) for a ledger, creating it on first use.
+
+        With create=False a ledger without a database file raises LedgerNotFound.
+
+        The writer is a single-thread executor. Writes submitted to it are
+        serialized and all use the tracker's one connection for that thread,
+        rather than each short-lived request thread opening its own.
+        """
+        if not LEDGER_NAME.match(name):
+            raise ValueError(f"Invalid ledger name: {name}")
+        with self._lock:
+            if name not in self._ledgers:
+                db_file = self.data_dir / f"{name}.db"
+                if not create and not db_file.exists():
+                    raise LedgerNotFound(f"Unknown ledger: {name}")
+                writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"ledger-{name}")
+                tracker = writer.submit(
+                    ExpenseTracker, str(db_file), cache_size=0, verbose=False,
+                    fx_rates_file=self.fx_rates_file
+                ).result()
+                self._ledgers[name] = (tracker, writer)
+            return self._ledgers[name]
+
+    def write(self, name, method, *args, create=True):
+        """Call a tracker write method on the ledger's writer thread and return its result"""
+        tracker, writer = self.get(name, create)
+        return writer.submit(getattr(tracker, method), *args).result()
+
+    def report(self, name, kind, query):
+        tracker, _ = self.get(name, create=False)
+        method, params = REPORTS[kind]
+        kwargs = {key: convert(query[key][0]) for key, convert in params.items() if key in query}
+        return self.pool.submit(_run_report, tracker.db_file, self.fx_rates_file, method, kwargs).result()
+
+    def close(self):
+        self.pool.shutdown()
+        with self._lock:
+            for tracker, writer in self._ledgers.values():
+                writer.submit(tracker.close).result()
+                writer.shutdown()
+            self._ledgers.clear()
+
+
+class LedgerRequestHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def log_message(self, format, *args):
+        pass  # keep the console quiet under load
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _route(self, methods):
+        parsed = urlparse(self.path)
+        match = ROUTE.match(parsed.path)
+        if not match or match.group(2) not in methods:
+            self._send(404, {'error': 'not found'})
+            return None
+        return match.group(1), match.group(2), match.group(3), parse_qs(parsed.query)
+
+    def _handle(self, methods, action):
+        route = self._route(methods)
+        if route is None:
+            return
+        try:
+            status, payload = action(*route)
+        except LedgerNotFound as error:
+            status, payload = 404, {'error': str(error)}
+        except (ValueError, KeyError, TypeError) as error:
+            status, payload = 400, {'error': str(error)}
+        except Exception as error:
+            status, payload = 500, {'error': str(error)}
+        self._send(status, payload)
+
+    def do_GET(self):
+        def action(name, kind, _, query):
+            return 200, self.registry.report(name, kind, query)
+        self._handle(REPORTS, action)
+
+    def do_POST(self):
+        def action(name, kind, _, query):
+            data = self._read_json()
+            ok = self.registry.write(
+                name, 'add_expense', float(data['amount']), data['category'], data.get('description', ''),
+                data.get('date'), data.get('payment_method', 'Cash'), data.get('currency')
+            )
+            return (201, {'ok': True}) if ok else (400, {'error': 'invalid category, currency or date'})
+        self._handle(('expenses',), action)
+
+    def do_PUT(self):
+        def action(name, kind, _, query):
+            data = self._read_json()
+            ok = self.registry.write(name, 'set_budget', data['category'], float(data['amount']),
+                                     data.get('month_year'), data.get('currency'))
+            return (200, {'ok': True}) if ok else (400, {'error': 'invalid category or currency'})
+        self._handle(('budgets',), action)
+
+    def do_DELETE(self):
+        def action(name, kind, expense_id, query):
+            if expense_id is None:
+                return 404, {'error': 'not found'}
+            deleted = self.registry.write(name, 'delete_expense', int(expense_id), create=False)
+            return (200, {'ok': True}) if deleted else (404, {'error': 'expense not found'})
+        self._handle(('expenses',), action)
+
+
+def make_server(data_dir, host='127.0.0.1', port=8765, workers=None, fx_rates_file=None):
+    registry = LedgerRegistry(data_dir, workers, fx_rates_file)
+    handler = type('BoundLedgerRequestHandler', (LedgerRequestHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, registry
+
+
+def serve(data_dir, host='127.0.0.1', port=8765, workers=None, fx_rates_file=None):
+    server, registry = make_server(data_dir, host, port, workers, fx_rates_file)
+    print(f"Serving ledgers from {data_dir} on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        registry.close()
+
+
+# ---------- Load generator ----------
+def _request(url, method='GET', payload=None):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def run_load_test(base_url, requests=1000, concurrency=8, ledgers=4, mix=(0.5, 0.3, 0.2), seed=0):
+    """Fire a mix of add/summary/budget requests and report latency percentiles per kind"""
+    rng = random.Random(seed)
+    categories = ExpenseTracker.CATEGORIES
+    now = time.localtime()
+    month_year = f"{now.tm_year}-{now.tm_mon:02d}"
+
+    def make_call():
+        ledger = f"bench-{rng.randrange(ledgers)}"
+        kind = rng.choices(('add', 'summary', 'budget'), weights=mix)[0]
+        if kind == 'add':
+            payload = {
+                'amount': round(rng.uniform(1, 200), 2),
+                'category': rng.choice(categories),
+                'description': 'load test',
+                'payment_method': rng.choice(('Cash', 'Card')),
+            }
+            return kind, f"{base_url}/ledgers/{ledger}/expenses", 'POST', payload
+        if kind == 'summary':
+            return kind, f"{base_url}/ledgers/{ledger}/summary", 'GET', None
+        return kind, f"{base_url}/ledgers/{ledger}/budget?month_year={month_year}", 'GET', None
+
+    calls = [make_call() for _ in range(requests)]
+    # Reports on a ledger that was never written to are 404s, so give each one an expense first
+    for ledger in range(ledgers):
+        _request(f"{base_url}/ledgers/bench-{ledger}/expenses", 'POST',
+                 {'amount': 1, 'category': categories[0], 'description': 'load test'})
+
+    def timed(call):
+        kind, url, method, payload = call
+        started = time.perf_counter()
+        status = _request(url, method, payload)
+        return kind, (time.perf_counter() - started) * 1000, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, calls))
+    elapsed = time.perf_counter() - started
+
+    report = {'requests': requests, 'concurrency': concurrency, 'seconds': round(elapsed, 3),
+              'requests_per_second': round(requests / elapsed, 1), 'operations': {}}
+    for kind in ('add', 'summary', 'budget'):
+        latencies = np.array([ms for k, ms, _ in results if k == kind])
+        if latencies.size == 0:
+            continue
+        report['operations'][kind] = {
+            'count': int(latencies.size),
+            'errors': sum(1 for k, _, status in results if k == kind and status >= 400),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-ledger expense tracker service")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="run the HTTP/JSON service")
+    serve_parser.add_argument('--data-dir', default='ledgers')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--workers', type=int, default=None, help="report worker processes")
+    serve_parser.add_argument('--fx-rates', help="CSV of daily FX rates used for currency conversion")
+
+    bench_parser = commands.add_parser('bench', help="load-test a running service, or a temporary one")
+    bench_parser.add_argument('--url', help="service to test; starts a temporary one when omitted")
+    bench_parser.add_argument('--requests', type=int, default=1000)
+    bench_parser.add_argument('--concurrency', type=int, default=8)
+    bench_parser.add_argument('--ledgers', type=int, default=4)
+    bench_parser.add_argument('--workers', type=int, default=None)
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        serve(args.data_dir, args.host, args.port, args.workers, args.fx_rates)
+        return
+
+    if args.url:
+        report = run_load_test(args.url.rstrip('/'), args.requests, args.concurrency, args.ledgers)
+    else:
+        with tempfile.TemporaryDirectory() as data_dir:
+            server, registry = make_server(data_dir, port=0, workers=args.workers)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                url = f"http://127.0.0.1:{server.server_address[1]}"
+                report = run_load_test(url, args.requests, args.concurrency, args.ledgers)
+            finally:
+                server.shutdown()
+                server.server_close()
+                registry.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
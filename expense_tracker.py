@@ -1,31 +1,629 @@
 import pandas as pd
 import sqlite3
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import threading
+import time
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import re
+import shlex
+import shutil
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
 from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
 import numpy as np
 from dateutil.relativedelta import relativedelta
 import warnings
 warnings.filterwarnings('ignore')
 
-# Set style for better visualizations
-plt.style.use('seaborn-v0_8')
-sns.set_palette("husl")
+# Plotting libraries are imported on first use (see _pyplot), so scripted
+# adds and deletes don't pay for matplotlib and seaborn at startup
+_plot_style_applied = False
+
+# Amounts are stored and summed as integer cents (hundredths of a currency unit)
+CENTS_PER_UNIT = 100
+
+def to_cents(amount):
+    """Convert an amount in currency units (number, string or Decimal) to integer cents, rounding half up"""
+    return int(Decimal(str(amount)).scaleb(2).to_integral_value(ROUND_HALF_UP))
+
+def amounts_to_cents(amounts):
+    """Convert a Series of amounts (numbers or numeric strings) to cents exactly as to_cents does.
+    
+    Unparseable values become NaN. An amount with at most two decimals parses
+    to the double nearest k/100, so rint(x * 100) is exactly k; only finer
+    amounts, where float rounding would differ from half-up, go through Decimal.
+    """
+    numbers = pd.to_numeric(amounts, errors='coerce').astype(float)
+    cents = pd.Series(np.rint(numbers * CENTS_PER_UNIT), index=amounts.index)
+    finer = np.isfinite(numbers) & (np.round(numbers, 2) != numbers)
+    if finer.any():
+        cents[finer] = amounts[finer].astype(str).map(to_cents)
+    return cents
+
+def from_cents(cents):
+    """Convert integer cents (a number, Series or DataFrame) back to currency units for display"""
+    return cents / CENTS_PER_UNIT
+
+def _create_search_index(conn):
+    """Migration step: FTS5 index over expense descriptions, kept in sync by triggers.
+    
+    Skipped when SQLite was built without FTS5; search_expenses then falls back to LIKE.
+    """
+    if not conn.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0]:
+        return
+    statements = (
+        # External content: the index stores only tokens and reads descriptions from expenses.
+        # Bulk imports suspend the insert trigger and index each chunk with one statement
+        '''
+        CREATE VIRTUAL TABLE expenses_fts USING fts5(
+            description, content='expenses', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        ''',
+        "INSERT INTO expenses_fts (expenses_fts) VALUES ('rebuild')",
+        '''
+        CREATE TRIGGER trg_expenses_fts_insert AFTER INSERT ON expenses
+        WHEN NOT (SELECT suspended FROM rollup_state)
+        BEGIN
+            INSERT INTO expenses_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_expenses_fts_delete AFTER DELETE ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_expenses_fts_update AFTER UPDATE OF description ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+            INSERT INTO expenses_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END
+        ''',
+    )
+    for statement in statements:
+        conn.execute(statement)
 
 class ExpenseTracker:
-    def __init__(self, db_file="expenses.db"):
+    CATEGORIES = (
+        'Food & Dining', 'Transportation', 'Shopping', 'Entertainment',
+        'Bills & Utilities', 'Healthcare', 'Education', 'Travel',
+        'Personal Care', 'Gifts & Donations', 'Other'
+    )
+    # Applied to every connection the tracker opens
+    PRAGMAS = (
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-16000",  # ~16 MB page cache
+        "PRAGMA mmap_size=134217728",
+    )
+    STATEMENT_CACHE_SIZE = 256
+    # Columns accepted by the bulk import path, in positional order for tuple rows;
+    # an int64 amount_cents column may stand in for amount
+    EXPENSE_FIELDS = ['amount', 'category', 'description', 'date', 'payment_method', 'currency']
+    BULK_CHUNK_SIZE = 50000
+    # Stored columns of the expenses table, and the columns get_expenses_dataframe can derive.
+    # Amounts are integer cents (int64 in DataFrames); reports convert their totals to currency units
+    EXPENSE_COLUMNS = ('id', 'amount_cents', 'category', 'description', 'date', 'payment_method', 'currency',
+                       'created_at')
+    # Currency of amounts recorded without one; FX rate files quote every currency in it
+    DEFAULT_CURRENCY = 'USD'
+    DERIVED_COLUMNS = ('month', 'year', 'month_name', 'day_name')
+    # Billing periods detect_recurring recognizes: (name, interval in days, tolerance in days)
+    RECURRING_PERIODS = (
+        ('weekly', 7, 2),
+        ('biweekly', 14, 3),
+        ('monthly', 30.44, 4),
+        ('quarterly', 91.31, 10),
+        ('yearly', 365.25, 15),
+    )
+    # Schema migrations, applied in order and tracked with PRAGMA user_version;
+    # a step is an SQL statement or a callable taking the connection
+    MIGRATIONS = [
+        # 1: covering index for date-range reads, category lookups and a unique
+        #    budget key so set_budget can UPSERT
+        (
+            "CREATE INDEX IF NOT EXISTS idx_expenses_date_category_amount ON expenses(date, category, amount)",
+            "CREATE INDEX IF NOT EXISTS idx_expenses_category_date ON expenses(category, date)",
+            "DELETE FROM budgets WHERE id NOT IN (SELECT MAX(id) FROM budgets GROUP BY category, month_year)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_budgets_month_category ON budgets(month_year, category)",
+        ),
+        # 2: per month/category rollup kept current by triggers, so historical
+        #    reports never have to scan raw expenses
+        (
+            '''
+            CREATE TABLE IF NOT EXISTS monthly_category_totals (
+                month_year TEXT NOT NULL,
+                category TEXT NOT NULL,
+                total REAL NOT NULL DEFAULT 0,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (month_year, category)
+            ) WITHOUT ROWID
+            ''',
+            # Bulk imports suspend the row triggers inside their own transaction and
+            # apply one aggregated update per chunk instead
+            '''
+            CREATE TABLE IF NOT EXISTS rollup_state (
+                id INTEGER PRIMARY KEY CHECK(id = 1),
+                suspended INTEGER NOT NULL DEFAULT 0
+            )
+            ''',
+            "INSERT OR IGNORE INTO rollup_state (id, suspended) VALUES (1, 0)",
+            '''
+            CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_insert AFTER INSERT ON expenses
+            WHEN NOT (SELECT suspended FROM rollup_state)
+            BEGIN
+                INSERT INTO monthly_category_totals (month_year, category, total, count)
+                VALUES (substr(NEW.date, 1, 7), NEW.category, NEW.amount, 1)
+                ON CONFLICT(month_year, category) DO UPDATE
+                SET total = total + excluded.total, count = count + 1;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_delete AFTER DELETE ON expenses
+            WHEN NOT (SELECT suspended FROM rollup_state)
+            BEGIN
+                UPDATE monthly_category_totals
+                SET total = total - OLD.amount, count = count - 1
+                WHERE month_year = substr(OLD.date, 1, 7) AND category = OLD.category;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_update AFTER UPDATE OF amount, category, date ON expenses
+            WHEN NOT (SELECT suspended FROM rollup_state)
+            BEGIN
+                UPDATE monthly_category_totals
+                SET total = total - OLD.amount, count = count - 1
+                WHERE month_year = substr(OLD.date, 1, 7) AND category = OLD.category;
+                INSERT INTO monthly_category_totals (month_year, category, total, count)
+                VALUES (substr(NEW.date, 1, 7), NEW.category, NEW.amount, 1)
+                ON CONFLICT(month_year, category) DO UPDATE
+                SET total = total + excluded.total, count = count + 1;
+            END
+            ''',
+            '''
+            INSERT OR REPLACE INTO monthly_category_totals (month_year, category, total, count)
+            SELECT substr(date, 1, 7), category, SUM(amount), COUNT(*)
+            FROM expenses
+            GROUP BY substr(date, 1, 7), category
+            ''',
+        ),
+        # 3: stamp every rollup change with a global revision so the Parquet
+        #    snapshot can tell which months changed; any column update counts
+        (
+            "ALTER TABLE monthly_category_totals ADD COLUMN revision INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE rollup_state ADD COLUMN revision INTEGER NOT NULL DEFAULT 0",
+            "DROP TRIGGER IF EXISTS trg_expenses_rollup_insert",
+            "DROP TRIGGER IF EXISTS trg_expenses_rollup_delete",
+            "DROP TRIGGER IF EXISTS trg_expenses_rollup_update",
+            '''
+            CREATE TRIGGER trg_expenses_rollup_insert AFTER INSERT ON expenses
+            WHEN NOT (SELECT suspended FROM rollup_state)
+            BEGIN
+                UPDATE rollup_state SET revision = revision + 1;
+                INSERT INTO monthly_category_totals (month_year, category, total, count, revision)
+                VALUES (substr(NEW.date, 1, 7), NEW.category, NEW.amount, 1, (SELECT revision FROM rollup_state))
+                ON CONFLICT(month_year, category) DO UPDATE
+                SET total = total + excluded.total, count = count + 1, revision = excluded.revision;
+            END
+            ''',
+            '''
+            CREATE TRIGGER trg_expenses_rollup_delete AFTER DELETE ON expenses
+            WHEN NOT (SELECT suspended FROM rollup_state)
+            BEGIN
+                UPDATE rollup_state SET revision = revision + 1;
+                UPDATE monthly_category_totals
+                SET total = total - OLD.amount, count = count - 1, revision = (SELECT revision FROM rollup_state)
+                WHERE month_year = substr(OLD.date, 1, 7) AND category = OLD.category;
+            END
+            ''',
+            '''
+            CREATE TRIGGER trg_expenses_rollup_update AFTER UPDATE ON expenses
+            WHEN NOT (SELECT suspended FROM rollup_state)
+            BEGIN
+                UPDATE rollup_state SET revision = revision + 1;
+                UPDATE monthly_category_totals
+                SET total = total - OLD.amount, count = count - 1, revision = (SELECT revision FROM rollup_state)
+                WHERE month_year = substr(OLD.date, 1, 7) AND category = OLD.category;
+                INSERT INTO monthly_category_totals (month_year, category, total, count, revision)
+                VALUES (substr(NEW.date, 1, 7), NEW.category, NEW.amount, 1, (SELECT revision FROM rollup_state))
+                ON CONFLICT(month_year, category) DO UPDATE
+                SET total = total + excluded.total, count = count + 1, revision = excluded.revision;
+            END
+            ''',
+        ),
+        # 4: a currency per expense and budget (existing rows are USD), a
+        #    currency-first covering index for converted reports, and the rollup
+        #    split by currency so it never sums amounts in different currencies
+        (
+            "ALTER TABLE expenses ADD COLUMN currency TEXT NOT NULL DEFAULT 'USD'",
+            "ALTER TABLE budgets ADD COLUMN currency TEXT NOT NULL DEFAULT 'USD'",
+            "CREATE INDEX IF NOT EXISTS idx_expenses_currency_date ON expenses(currency, date, category, amount)",
+            "DROP TRIGGER IF EXISTS trg_expenses_rollup_insert",
+            "DROP TRIGGER IF EXISTS trg_expenses_rollup_delete",
+            "DROP TRIGGER IF EXISTS trg_expenses_rollup_update",
+            # A new revision for every month makes the next snapshot sync rewrite all partitions
+            "UPDATE rollup_state SET revision = revision + 1",
+            '''
+            CREATE TABLE monthly_category_totals_new (
+                month_year TEXT NOT NULL,
+                category TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                total REAL NOT NULL DEFAULT 0,
+                count INTEGER NOT NULL DEFAULT 0,
+                revision INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (month_year, category, currency)
+            ) WITHOUT ROWID
+            ''',
+            '''
+            INSERT INTO monthly_category_totals_new (month_year, category, currency, total, count, revision)
+            SELECT substr(date, 1, 7), category, currency, SUM(amount), COUNT(*), (SELECT revision FROM rollup_state)
+            FROM expenses
+            GROUP BY substr(date, 1, 7), category, currency
+            ''',
+            "DROP TABLE monthly_category_totals",
+            "ALTER TABLE monthly_category_totals_new RENAME TO monthly_category_totals",
+            '''
+            CREATE TRIGGER trg_expenses_rollup_insert AFTER INSERT ON expenses
+            WHEN NOT (SELECT suspended FROM rollup_state)
+            BEGIN
+                UPDATE rollup_state SET revision = revision + 1;
+                INSERT INTO monthly_category_totals (month_year, category, currency, total, count, revision)
+                VALUES (substr(NEW.date, 1, 7), NEW.category, NEW.currency, NEW.amount, 1,
+                        (SELECT revision FROM rollup_state))
+                ON CONFLICT(month_year, category, currency) DO UPDATE
+                SET total = total + excluded.total, count = count + 1, revision = excluded.revision;
+            END
+            ''',
+            '''
+            CREATE TRIGGER trg_expenses_rollup_delete AFTER DELETE ON expenses
+            WHEN NOT (SELECT suspended FROM rollup_state)
+            BEGIN
+                UPDATE rollup_state SET revision = revision + 1;
+                UPDATE monthly_category_totals
+                SET total = total - OLD.amount, count = count - 1, revision = (SELECT revision FROM rollup_state)
+                WHERE month_year = substr(OLD.date, 1, 7) AND category = OLD.category AND currency = OLD.currency;
+            END
+            ''',
+            '''
+            CREATE TRIGGER trg_expenses_rollup_update AFTER UPDATE ON expenses
+            WHEN NOT (SELECT suspended FROM rollup_state)
+            BEGIN
+                UPDATE rollup_state SET revision = revision + 1;
+                UPDATE monthly_category_totals
+                SET total = total - OLD.amount, count = count - 1, revision = (SELECT revision FROM rollup_state)
+                WHERE month_year = substr(OLD.date, 1, 7) AND category = OLD.category AND currency = OLD.currency;
+                INSERT INTO monthly_category_totals (month_year, category, currency, total, count, revision)
+                VALUES (substr(NEW.date, 1, 7), NEW.category, NEW.currency, NEW.amount, 1,
+                        (SELECT revision FROM rollup_state))
+                ON CONFLICT(month_year, category, currency) DO UPDATE
+                SET total = total + excluded.total, count = count + 1, revision = excluded.revision;
+            END
+            ''',
+        ),
+        # 5: amounts stored as integer cents (amount_cents) in expenses, budgets
+        #    and the rollup, so sums are exact however many rows they cover
+        (
+            "DROP TRIGGER IF EXISTS trg_expenses_rollup_insert",
+            "DROP TRIGGER IF EXISTS trg_expenses_rollup_delete",
+            "DROP TRIGGER IF EXISTS trg_expenses_rollup_update",
+            "DROP INDEX IF EXISTS idx_expenses_date_category_amount",
+            "DROP INDEX IF EXISTS idx_expenses_currency_date",
+            "ALTER TABLE expenses ADD COLUMN amount_cents INTEGER NOT NULL DEFAULT 0",
+            "UPDATE expenses SET amount_cents = CAST(ROUND(amount * 100) AS INTEGER)",
+            "ALTER TABLE expenses DROP COLUMN amount",
+            "ALTER TABLE budgets ADD COLUMN amount_cents INTEGER NOT NULL DEFAULT 0",
+            "UPDATE budgets SET amount_cents = CAST(ROUND(amount * 100) AS INTEGER)",
+            "ALTER TABLE budgets DROP COLUMN amount",
+            "CREATE INDEX idx_expenses_date_category_amount ON expenses(date, category, amount_cents)",
+            "CREATE INDEX idx_expenses_currency_date ON expenses(currency, date, category, amount_cents)",
+            # Snapshot partitions still hold float amounts, so every month gets a new revision
+            "UPDATE rollup_state SET revision = revision + 1",
+            '''
+            CREATE TABLE monthly_category_totals_new (
+                month_year TEXT NOT NULL,
+                category TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                total_cents INTEGER NOT NULL DEFAULT 0,
+                count INTEGER NOT NULL DEFAULT 0,
+                revision INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (month_year, category, currency)
+            ) WITHOUT ROWID
+            ''',
+            '''
+            INSERT INTO monthly_category_totals_new (month_year, category, currency, total_cents, count, revision)
+            SELECT substr(date, 1, 7), category, currency, SUM(amount_cents), COUNT(*),
+                   (SELECT revision FROM rollup_state)
+            FROM expenses
+            GROUP BY substr(date, 1, 7), category, currency
+            ''',
+            "DROP TABLE monthly_category_totals",
+            "ALTER TABLE monthly_category_totals_new RENAME TO monthly_category_totals",
+            '''
+            CREATE TRIGGER trg_expenses_rollup_insert AFTER INSERT ON expenses
+            WHEN NOT (SELECT suspended FROM rollup_state)
+            BEGIN
+                UPDATE rollup_state SET revision = revision + 1;
+                INSERT INTO monthly_category_totals (month_year, category, currency, total_cents, count, revision)
+                VALUES (substr(NEW.date, 1, 7), NEW.category, NEW.currency, NEW.amount_cents, 1,
+                        (SELECT revision FROM rollup_state))
+                ON CONFLICT(month_year, category, currency) DO UPDATE
+                SET total_cents = total_cents + excluded.total_cents, count = count + 1,
+                    revision = excluded.revision;
+            END
+            ''',
+            '''
+            CREATE TRIGGER trg_expenses_rollup_delete AFTER DELETE ON expenses
+            WHEN NOT (SELECT suspended FROM rollup_state)
+            BEGIN
+                UPDATE rollup_state SET revision = revision + 1;
+                UPDATE monthly_category_totals
+                SET total_cents = total_cents - OLD.amount_cents, count = count - 1,
+                    revision = (SELECT revision FROM rollup_state)
+                WHERE month_year = substr(OLD.date, 1, 7) AND category = OLD.category AND currency = OLD.currency;
+            END
+            ''',
+            '''
+            CREATE TRIGGER trg_expenses_rollup_update AFTER UPDATE ON expenses
+            WHEN NOT (SELECT suspended FROM rollup_state)
+            BEGIN
+                UPDATE rollup_state SET revision = revision + 1;
+                UPDATE monthly_category_totals
+                SET total_cents = total_cents - OLD.amount_cents, count = count - 1,
+                    revision = (SELECT revision FROM rollup_state)
+                WHERE month_year = substr(OLD.date, 1, 7) AND category = OLD.category AND currency = OLD.currency;
+                INSERT INTO monthly_category_totals (month_year, category, currency, total_cents, count, revision)
+                VALUES (substr(NEW.date, 1, 7), NEW.category, NEW.currency, NEW.amount_cents, 1,
+                        (SELECT revision FROM rollup_state))
+                ON CONFLICT(month_year, category, currency) DO UPDATE
+                SET total_cents = total_cents + excluded.total_cents, count = count + 1,
+                    revision = excluded.revision;
+            END
+            ''',
+        ),
+        # 6: full-text search over descriptions (a callable, since it depends on FTS5 being available)
+        (_create_search_index,),
+    ]
+    # Parsed FX rate tables shared by every tracker in the process, keyed by
+    # file path and refreshed when the file's size or mtime changes
+    _fx_cache = {}
+
+    def __init__(self, db_file="expenses.db", snapshot_dir=None, cache_size=128, verbose=True,
+                 base_currency=None, fx_rates_file=None):
         self.db_file = db_file
-        self.categories = [
-            'Food & Dining', 'Transportation', 'Shopping', 'Entertainment',
-            'Bills & Utilities', 'Healthcare', 'Education', 'Travel',
-            'Personal Care', 'Gifts & Donations', 'Other'
-        ]
+        # Reports are converted into base_currency using the daily rates in fx_rates_file,
+        # a CSV of date,currency,rate where rate is the value of one unit in DEFAULT_CURRENCY
+        self.base_currency = (base_currency or self.DEFAULT_CURRENCY).upper()
+        self.fx_rates_file = Path(fx_rates_file) if fx_rates_file else None
+        # Status messages go to stdout; services and scripts turn them off
+        self.verbose = verbose
+        # Optional Parquet copy of the ledger, partitioned by year/month, used for analytical reads
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        self.categories = list(self.CATEGORIES)
+        # One long-lived connection per thread, tracked with its thread so close() can
+        # release them all and connections of threads that have exited get reaped
+        self._local = threading.local()
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        # LRU cache of report results; each entry is tagged with the
+        # ('expenses' | 'budgets', 'YYYY-MM') data it was computed from
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0
+        self._data_versions = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.init_database()
     
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _connect(self):
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_file,
+                cached_statements=self.STATEMENT_CACHE_SIZE,
+                check_same_thread=False
+            )
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            # WAL is persistent, so only the first connection to a new file has to switch it
+            if conn.execute("PRAGMA journal_mode").fetchone()[0] != 'wal':
+                conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.depth = 0
+            self._local.stale_tags = set()
+            with self._connections_lock:
+                self._reap_connections()
+                self._connections[conn] = threading.current_thread()
+        return conn
+    
+    def _reap_connections(self):
+        """Close connections whose threads have exited; caller holds _connections_lock"""
+        for conn, thread in list(self._connections.items()):
+            if not thread.is_alive():
+                conn.close()
+                del self._connections[conn]
+                self._data_versions.pop(id(conn), None)
+    
+    def _in_transaction(self):
+        """Whether the calling thread's connection has uncommitted writes open"""
+        conn = getattr(self._local, 'conn', None)
+        return bool(getattr(self._local, 'depth', 0)) or (conn is not None and conn.in_transaction)
+    
+    def close_thread(self):
+        """Close the calling thread's connection; the next call from this thread opens a new one.
+        
+        For callers that use the tracker from short-lived threads, such as
+        one thread per request.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        if self._local.depth:
+            raise RuntimeError("close_thread() called inside a transaction")
+        with self._connections_lock:
+            self._connections.pop(conn, None)
+            self._data_versions.pop(id(conn), None)
+        conn.close()
+        self._local.conn = None
+    
+    @contextmanager
+    def transaction(self):
+        """Group several writes into one transaction; nested blocks join the outer one"""
+        conn = self._connect()
+        self._local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                self._local.stale_tags = set()
+                conn.rollback()
+            raise
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            stale_tags, self._local.stale_tags = self._local.stale_tags, set()
+            conn.commit()
+            if stale_tags:
+                self._drop_cached(stale_tags)
+    
+    def close(self):
+        """Close every connection opened by this tracker"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = {}
+        self._local = threading.local()
+        self._data_versions = {}
+    
+    def _cached(self, key, tags, compute):
+        """Return a cached report result, computing and storing it on a miss.
+        
+        Results are copied on the way out so callers can modify them freely.
+        Commits made through other connections (other threads or processes)
+        can't be traced to a month, so noticing one clears the whole cache.
+        """
+        conn = self._connect()
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._data_versions.get(id(conn), data_version) != data_version:
+            self.clear_cache()
+        self._data_versions[id(conn)] = data_version
+        
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return self._copy_result(entry[0])
+            self.cache_misses += 1
+            generation = self._cache_generation
+        
+        value = compute()
+        
+        # Uncommitted reads and results raced by a write are not worth keeping
+        if self.cache_size and getattr(self._local, 'depth', 0) == 0:
+            with self._cache_lock:
+                if generation == self._cache_generation:
+                    self._cache[key] = (value, frozenset(tags))
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        return self._copy_result(value)
+    
+    @staticmethod
+    def _copy_result(value):
+        if isinstance(value, tuple):
+            return tuple(item.copy() for item in value)
+        if isinstance(value, pd.DataFrame):
+            return value.copy()
+        return value
+    
+    def _invalidate(self, kind, months):
+        """Drop cached results that depend on the given months of expenses or budgets.
+        
+        Inside a transaction the drop waits for the outermost commit: until
+        then other threads still read, and may cache, the old rows.
+        """
+        tags = {(kind, month_year) for month_year in months}
+        if getattr(self._local, 'depth', 0):
+            self._local.stale_tags |= tags
+            return
+        self._drop_cached(tags)
+    
+    def _drop_cached(self, tags):
+        with self._cache_lock:
+            self._cache_generation += 1
+            for key in [key for key, (_, entry_tags) in self._cache.items() if entry_tags & tags]:
+                del self._cache[key]
+    
+    def clear_cache(self):
+        """Forget every cached report result"""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._cache.clear()
+    
+    def cache_info(self):
+        """Hit/miss counters and current size of the report cache"""
+        with self._cache_lock:
+            return {
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'size': len(self._cache),
+                'maxsize': self.cache_size
+            }
+    
     def init_database(self):
         """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
+        with self.transaction() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] == len(self.MIGRATIONS):
+                return
+            # Take the write lock before creating tables or reading the schema version again,
+            # so processes opening the same un-migrated ledger at once upgrade it one at a time
+            # and the later ones find it already done. DDL would not open a transaction itself
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            self._create_tables(conn.cursor())
+            self._migrate(conn)
+    
+    def _migrate(self, conn):
+        """Apply any migrations newer than the database's schema version; run inside init_database's transaction"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        pending = self.MIGRATIONS[version:]
+        for number, statements in enumerate(pending, version + 1):
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+    
+    def explain(self, query, params=()):
+        """Return the EXPLAIN QUERY PLAN details for a query, e.g. to check index usage"""
+        rows = self._connect().execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+        return [row[-1] for row in rows]
+    
+    def _create_tables(self, cursor):
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS expenses (
@@ -48,37 +646,402 @@ class ExpenseTracker:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
-        
-        conn.commit()
-        conn.close()
     
-    def add_expense(self, amount, category, description="", date=None, payment_method="Cash"):
-        """Add a new expense"""
+    def add_expense(self, amount, category, description="", date=None, payment_method="Cash", currency=None):
+        """Add a new expense (currency defaults to the tracker's base currency)"""
         if category not in self.categories:
-            print(f"Invalid category! Available categories: {', '.join(self.categories)}")
+            self._log(f"Invalid category! Available categories: {', '.join(self.categories)}")
+            return False
+        
+        currency = (currency or self.base_currency).upper()
+        if not self._is_currency_code(currency):
+            self._log(f"Invalid currency '{currency}'! Use a three-letter code such as USD or EUR.")
             return False
         
         if date is None:
             date = datetime.now().strftime('%Y-%m-%d')
+        elif hasattr(date, 'strftime'):
+            date = date.strftime('%Y-%m-%d')
+        if not self._is_iso_date(date):
+            self._log(f"Invalid date '{date}'! Use YYYY-MM-DD.")
+            return False
         
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO expenses (amount, category, description, date, payment_method)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (amount, category, description, date, payment_method))
+        cents = to_cents(amount)
+        with self.transaction() as conn:
+            conn.execute('''
+                INSERT INTO expenses (amount_cents, category, description, date, payment_method, currency)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (cents, category, description, date, payment_method, currency))
         
-        conn.commit()
-        conn.close()
-        print(f"Expense of ${amount:.2f} added to '{category}' category!")
+        self._invalidate('expenses', [str(date)[:7]])
+        self._log(f"Expense of {from_cents(cents):.2f} {currency} added to '{category}' category!")
         return True
     
-    def get_expenses_dataframe(self, start_date=None, end_date=None):
-        """Get expenses as pandas DataFrame with optional date filtering"""
+    @staticmethod
+    def _is_currency_code(currency):
+        return len(currency) == 3 and currency.isalpha() and currency.isupper()
+    
+    @staticmethod
+    def _is_iso_date(date):
+        """Whether date is a real calendar date written as YYYY-MM-DD (reports and snapshots parse it so)"""
+        if not isinstance(date, str) or not re.fullmatch(r'\d{4}-\d{2}-\d{2}', date):
+            return False
+        try:
+            datetime.strptime(date, '%Y-%m-%d')
+        except ValueError:
+            return False
+        return True
+    
+    def add_expenses_bulk(self, expenses, chunk_size=None):
+        """Add many expenses at once from a DataFrame or an iterable of dicts/tuples.
+        
+        Rows are validated a chunk at a time and written with executemany, one
+        transaction per chunk. Returns a dict with the inserted count, a DataFrame
+        of rejected rows (with a 'reason' column) and the achieved throughput.
+        """
+        chunk_size = chunk_size or self.BULK_CHUNK_SIZE
+        return self._bulk_insert(self._iter_expense_chunks(expenses, chunk_size))
+    
+    def import_csv(self, filename, chunk_size=None):
+        """Import expenses from a CSV file with amount/category/description/date/payment_method columns"""
+        chunk_size = chunk_size or self.BULK_CHUNK_SIZE
+        # Read every column as text so amounts reach amounts_to_cents as written, never via float
+        return self._bulk_insert(pd.read_csv(filename, chunksize=chunk_size, dtype=str))
+    
+    def import_parquet(self, filename, chunk_size=None):
+        """Import expenses from a Parquet file, streaming it in record batches"""
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self._log("Parquet import requires pyarrow: pip install pyarrow")
+            return None
+        
+        chunk_size = chunk_size or self.BULK_CHUNK_SIZE
+        batches = pq.ParquetFile(filename).iter_batches(batch_size=chunk_size)
+        return self._bulk_insert(batch.to_pandas() for batch in batches)
+    
+    def import_file(self, filename, chunk_size=None):
+        """Import expenses from a .csv or .parquet file"""
+        if Path(filename).suffix.lower() == '.parquet':
+            return self.import_parquet(filename, chunk_size)
+        return self.import_csv(filename, chunk_size)
+    
+    def _iter_expense_chunks(self, expenses, chunk_size):
+        """Split a DataFrame or an iterable of rows into DataFrame chunks"""
+        if isinstance(expenses, pd.DataFrame):
+            for start in range(0, len(expenses), chunk_size):
+                yield expenses.iloc[start:start + chunk_size]
+            return
+        
+        rows_iter = iter(expenses)
+        while True:
+            rows = list(islice(rows_iter, chunk_size))
+            if not rows:
+                break
+            if isinstance(rows[0], dict):
+                yield pd.DataFrame.from_records(rows)
+            else:
+                yield pd.DataFrame.from_records(rows, columns=self.EXPENSE_FIELDS[:len(rows[0])])
+    
+    def _validate_expenses(self, chunk):
+        """Vectorized validation of one chunk; returns (valid rows, rejected rows)"""
+        chunk = chunk.rename(columns=lambda c: str(c).strip().lower())
+        # Keep the caller's index so rejected rows can be traced back to their source
+        frame = pd.DataFrame(index=chunk.index)
+        if 'amount_cents' in chunk:
+            cents = pd.to_numeric(chunk['amount_cents'], errors='coerce').astype(float)
+            cents = cents.where(cents == np.rint(cents))
+        elif 'amount' in chunk:
+            # Same Decimal half-up rounding as add_expense, so every path stores an amount identically
+            cents = amounts_to_cents(chunk['amount'])
+        else:
+            cents = pd.Series(np.nan, index=chunk.index)
+        frame['amount_cents'] = cents
+        frame['category'] = chunk.get('category')
+        frame['description'] = chunk['description'].fillna('').astype(str) if 'description' in chunk else ''
+        frame['payment_method'] = chunk['payment_method'].fillna('Cash').astype(str) if 'payment_method' in chunk else 'Cash'
+        if 'currency' in chunk:
+            frame['currency'] = chunk['currency'].fillna(self.base_currency).astype(str).str.strip().str.upper()
+            bad_currency = ~frame['currency'].str.fullmatch('[A-Z]{3}')
+        else:
+            frame['currency'] = self.base_currency
+            bad_currency = pd.Series(False, index=frame.index)
+        
+        if 'date' in chunk:
+            dates = pd.to_datetime(chunk['date'], errors='coerce', format='mixed')
+            missing_date = chunk['date'].isna()
+            frame['date'] = dates.dt.strftime('%Y-%m-%d')
+            frame.loc[missing_date, 'date'] = datetime.now().strftime('%Y-%m-%d')
+            bad_date = dates.isna() & ~missing_date
+        else:
+            frame['date'] = datetime.now().strftime('%Y-%m-%d')
+            bad_date = pd.Series(False, index=frame.index)
+        
+        reason = pd.Series('', index=frame.index, dtype=object)
+        reason[bad_date] = 'invalid date'
+        reason[bad_currency] = 'invalid currency'
+        reason[~frame['category'].isin(self.categories)] = 'invalid category'
+        reason[~np.isfinite(frame['amount_cents'])] = 'invalid amount'
+        
+        bad = reason != ''
+        rejected = chunk[bad].assign(reason=reason[bad])
+        valid = frame.loc[~bad, ['amount_cents'] + self.EXPENSE_FIELDS[1:]]
+        return valid.astype({'amount_cents': 'int64'}), rejected
+    
+    def _bulk_insert(self, chunks):
+        """Validate and write DataFrame chunks, one transaction per chunk"""
+        started = time.perf_counter()
+        inserted = 0
+        rejected_chunks = []
+        
+        for chunk in chunks:
+            valid, rejected = self._validate_expenses(chunk)
+            if not rejected.empty:
+                rejected_chunks.append(rejected)
+            if valid.empty:
+                continue
+            
+            # Date order keeps index inserts local
+            valid = valid.sort_values('date', kind='stable')
+            with self.transaction() as conn:
+                conn.execute("UPDATE rollup_state SET suspended = 1")
+                last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM expenses").fetchone()[0]
+                conn.executemany('''
+                    INSERT INTO expenses (amount_cents, category, description, date, payment_method, currency)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', valid.astype(object).values.tolist())
+                self._apply_rollup_delta(conn, valid)
+                if self._has_search_index(conn):
+                    conn.execute('''
+                        INSERT INTO expenses_fts (rowid, description)
+                        SELECT id, description FROM expenses WHERE id > ?
+                    ''', (last_id,))
+                conn.execute("UPDATE rollup_state SET suspended = 0")
+            self._invalidate('expenses', valid['date'].str[:7].unique())
+            inserted += len(valid)
+        
+        elapsed = time.perf_counter() - started
+        rejected = pd.concat(rejected_chunks) if rejected_chunks else pd.DataFrame()
+        rate = inserted / elapsed if elapsed > 0 else 0.0
+        self._log(f"Imported {inserted} expenses ({len(rejected)} rejected) in {elapsed:.2f}s - {rate:,.0f} rows/s")
+        return {
+            'inserted': inserted,
+            'rejected': rejected,
+            'seconds': elapsed,
+            'rows_per_second': rate
+        }
+    
+    def get_expenses_dataframe(self, start_date=None, end_date=None, columns=None, derive=DERIVED_COLUMNS,
+                               source=None):
+        """Get expenses as pandas DataFrame with optional date filtering.
+        
+        columns limits which stored columns are read (all by default) and derive
+        picks which of DERIVED_COLUMNS to add; pass derive=() when only the raw
+        data is needed, since the period/name columns are expensive to build.
+        source is 'sqlite' or 'snapshot'; by default the Parquet snapshot is used
+        whenever the tracker has one.
+        """
+        if source is None:
+            source = 'snapshot' if self.snapshot_dir else 'sqlite'
+        if source == 'snapshot':
+            df = self._read_snapshot(start_date, end_date, columns, derive)
+            if df is not None:
+                return self._prepare_expenses(df, derive)
+        
+        query, params = self._expenses_query(start_date, end_date, columns, derive)
+        df = pd.read_sql_query(query, self._connect(), params=params, parse_dates=['date'])
+        return self._prepare_expenses(df, derive)
+    
+    def iter_expenses(self, start_date=None, end_date=None, chunksize=None, columns=None,
+                      derive=DERIVED_COLUMNS, ascending=False):
+        """Yield expenses as DataFrame chunks of at most chunksize rows.
+        
+        Takes the same filters as get_expenses_dataframe but never holds more than
+        one chunk in memory, so it suits whole-history batch jobs.
+        """
+        chunksize = chunksize or self.BULK_CHUNK_SIZE
+        query, params = self._expenses_query(start_date, end_date, columns, derive)
+        if ascending:
+            query = query.replace("ORDER BY date DESC", "ORDER BY date")
+        
+        # A dedicated connection so callers can keep writing through the pooled one
         conn = sqlite3.connect(self.db_file)
+        try:
+            chunks = pd.read_sql_query(query, conn, params=params, parse_dates=['date'], chunksize=chunksize)
+            for chunk in chunks:
+                yield self._prepare_expenses(chunk, derive)
+        finally:
+            conn.close()
+    
+    def search_expenses(self, query, start_date=None, end_date=None, category=None, limit=50, offset=0):
+        """Find expenses whose description contains every word of `query`, the last one as a prefix.
+        
+        Uses the expenses_fts full-text index, best bm25 match first (lower rank
+        is better); without FTS5 it falls back to a LIKE scan ordered by date.
+        Returns one page of at most `limit` rows, skipping the first `offset`.
+        """
+        columns = ['id', 'date', 'category', 'description', 'amount_cents', 'payment_method', 'currency', 'rank']
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return pd.DataFrame(columns=columns)
+        
+        conn = self._connect()
+        if self._has_search_index(conn):
+            source = "expenses_fts JOIN expenses e ON e.id = expenses_fts.rowid"
+            filters = ["expenses_fts MATCH ?"]
+            # Whole words, except the last which may still be being typed
+            params = [' '.join(f'"{term}"' for term in terms) + '*']
+            rank, order = "bm25(expenses_fts)", "rank, e.date DESC"
+        else:
+            source = "expenses e"
+            filters = ["e.description LIKE ? ESCAPE '\\'"] * len(terms)
+            params = ['%' + re.sub(r'([\\%_])', r'\\\1', term) + '%' for term in terms]
+            rank, order = "NULL", "e.date DESC, e.id DESC"
         
-        query = "SELECT * FROM expenses"
+        if start_date:
+            filters.append("e.date >= ?")
+            params.append(start_date)
+        if end_date:
+            filters.append("e.date <= ?")
+            params.append(end_date)
+        if category:
+            filters.append("e.category = ?")
+            params.append(category)
+        
+        df = pd.read_sql_query(f'''
+            SELECT e.id, e.date, e.category, e.description, e.amount_cents, e.payment_method, e.currency,
+                   {rank} AS rank
+            FROM {source}
+            WHERE {" AND ".join(filters)}
+            ORDER BY {order}
+            LIMIT ? OFFSET ?
+        ''', conn, params=params + [limit, offset], parse_dates=['date'])
+        return self._prepare_expenses(df, derive=())
+    
+    @staticmethod
+    def _has_search_index(conn):
+        """Whether the expenses_fts index exists (SQLite may lack FTS5)"""
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'expenses_fts'").fetchone() is not None
+    
+    def sync_snapshot(self):
+        """Bring the Parquet snapshot up to date with the database.
+        
+        Each month's partition is rewritten only when its rollup revision changed
+        since the last sync, so a sync after a few writes touches a few months.
+        Returns the number of partitions written or removed, or None without pyarrow.
+        Must not be called inside transaction(): its uncommitted rows would be
+        recorded under a revision that a rollback lets the next commit reuse.
+        """
+        if self._in_transaction():
+            raise RuntimeError("sync_snapshot() cannot run inside an open transaction")
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            self._log("Parquet snapshots require pyarrow: pip install pyarrow")
+            return None
+        
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.snapshot_dir / '_manifest.json'
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+        
+        revisions = dict(self._connect().execute('''
+            SELECT month_year, MAX(revision)
+            FROM monthly_category_totals
+            GROUP BY month_year
+            HAVING SUM(count) > 0
+        ''').fetchall())
+        
+        changed = 0
+        for month_year in set(manifest) - set(revisions):
+            shutil.rmtree(self._snapshot_partition(month_year), ignore_errors=True)
+            del manifest[month_year]
+            changed += 1
+        
+        for month_year, revision in revisions.items():
+            if manifest.get(month_year) == revision:
+                continue
+            start = datetime.strptime(month_year, '%Y-%m')
+            end = start + relativedelta(months=1) - timedelta(days=1)
+            query, params = self._expenses_query(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+            df = pd.read_sql_query(query, self._connect(), params=params, parse_dates=['date'])
+            
+            partition = self._snapshot_partition(month_year)
+            partition.mkdir(parents=True, exist_ok=True)
+            # Write beside the old file and swap it in so readers never see a partial partition
+            tmp_path = partition / 'part-0.parquet.tmp'
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+            os.replace(tmp_path, partition / 'part-0.parquet')
+            manifest[month_year] = revision
+            changed += 1
+        
+        if changed:
+            tmp_path = manifest_path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(manifest, sort_keys=True))
+            os.replace(tmp_path, manifest_path)
+        return changed
+    
+    def _snapshot_partition(self, month_year):
+        year, month = month_year.split('-')
+        return self.snapshot_dir / f'year={int(year)}' / f'month={int(month)}'
+    
+    def _read_snapshot(self, start_date=None, end_date=None, columns=None, derive=()):
+        """Read expenses from the Parquet snapshot, pruning partitions by date.
+        
+        Returns None when pyarrow is missing, or inside an open transaction
+        (whose own writes only SQLite can see), so callers fall back to SQLite.
+        """
+        if self._in_transaction() or self.sync_snapshot() is None:
+            return None
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        
+        selected = list(self.EXPENSE_COLUMNS if columns is None else columns)
+        if derive and 'date' not in selected:
+            selected.append('date')
+        if not any(self.snapshot_dir.glob('year=*/month=*/*.parquet')):
+            return pd.DataFrame(columns=selected)
+        
+        partitioning = ds.partitioning(pa.schema([('year', pa.int16()), ('month', pa.int8())]), flavor='hive')
+        dataset = ds.dataset(self.snapshot_dir, format='parquet', partitioning=partitioning,
+                             exclude_invalid_files=True)
+        
+        # Comparisons on the partition keys let pyarrow skip whole month directories;
+        # the date comparison then trims the partial months at either end
+        year, month, date = ds.field('year'), ds.field('month'), ds.field('date')
+        conditions = []
+        if start_date:
+            start = pd.Timestamp(start_date)
+            conditions.append((year > start.year) | ((year == start.year) & (month >= start.month)))
+            conditions.append(date >= start)
+        if end_date:
+            end = pd.Timestamp(end_date)
+            conditions.append((year < end.year) | ((year == end.year) & (month <= end.month)))
+            conditions.append(date <= end)
+        row_filter = None
+        for condition in conditions:
+            row_filter = condition if row_filter is None else row_filter & condition
+        
+        # Only the snapshot columns are read; the partition keys stay out of the frame
+        read_columns = selected if 'date' in selected else selected + ['date']
+        df = dataset.to_table(columns=read_columns, filter=row_filter).to_pandas()
+        df = df.sort_values('date', ascending=False, kind='stable').reset_index(drop=True)
+        return df[selected]
+    
+    def _expenses_query(self, start_date=None, end_date=None, columns=None, derive=()):
+        """Build the SELECT used by the DataFrame readers"""
+        if columns is None:
+            selected = list(self.EXPENSE_COLUMNS)
+        else:
+            unknown = set(columns) - set(self.EXPENSE_COLUMNS)
+            if unknown:
+                raise ValueError(f"Unknown expense columns: {', '.join(sorted(unknown))}")
+            selected = list(columns)
+            # Derived columns are computed from the date
+            if derive and 'date' not in selected:
+                selected.append('date')
+        
+        query = f"SELECT {', '.join(selected)} FROM expenses"
         params = []
         
         if start_date and end_date:
@@ -92,108 +1055,429 @@ class ExpenseTracker:
             params.append(end_date)
         
         query += " ORDER BY date DESC"
+        return query, params
+    
+    def _prepare_expenses(self, df, derive):
+        """Apply compact dtypes and add the requested derived columns"""
+        for column in ('category', 'payment_method', 'currency'):
+            if column in df:
+                df[column] = df[column].astype('category')
         
-        df = pd.read_sql_query(query, conn, params=params)
-        conn.close()
-        
-        if not df.empty:
-            df['date'] = pd.to_datetime(df['date'])
-            df['month'] = df['date'].dt.to_period('M')
-            df['year'] = df['date'].dt.year
-            df['month_name'] = df['date'].dt.strftime('%B')
-            df['day_name'] = df['date'].dt.day_name()
+        if df.empty:
+            return df
+        
+        unknown = set(derive) - set(self.DERIVED_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown derived columns: {', '.join(sorted(unknown))}")
+        dates = df['date'].dt if derive else None
+        if 'month' in derive:
+            df['month'] = dates.to_period('M')
+        if 'year' in derive:
+            df['year'] = dates.year
+        if 'month_name' in derive:
+            df['month_name'] = dates.month_name()
+        if 'day_name' in derive:
+            df['day_name'] = dates.day_name()
         
         return df
     
-    def get_monthly_summary(self, year=None, month=None):
-        """Get monthly summary of expenses"""
+    def _category_totals(self, start_date, end_date, by_month=False, currency=None):
+        """Sum and count expenses per category (and per month) in one currency with SQL GROUP BY.
+        
+        Amounts already in `currency` (the base currency by default) are summed
+        in SQL: whole months inside the range come from the monthly_category_totals
+        rollup and only partial months at either edge touch the raw expenses.
+        Amounts in other currencies are summed per day in SQL and then converted
+        with the daily FX rates in one vectorized step.
+        """
+        currency = (currency or self.base_currency).upper()
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        first_full = start if start.day == 1 else start.replace(day=1) + relativedelta(months=1)
+        last_full = end.replace(day=1)
+        if (end + timedelta(days=1)).month == end.month:
+            last_full -= relativedelta(months=1)
+        
+        parts = []
+        params = []
+        raw_query = '''
+            SELECT substr(date, 1, 7) AS month, category, SUM(amount_cents) AS total_cents, COUNT(*) AS count
+            FROM expenses
+            WHERE currency = ? AND date BETWEEN ? AND ?
+            GROUP BY month, category
+        '''
+        if first_full > last_full:
+            parts.append(raw_query)
+            params.extend([currency, start_date, end_date])
+        else:
+            parts.append('''
+                SELECT month_year AS month, category, total_cents, count
+                FROM monthly_category_totals
+                WHERE month_year BETWEEN ? AND ? AND currency = ? AND count > 0
+            ''')
+            params.extend([first_full.strftime('%Y-%m'), last_full.strftime('%Y-%m'), currency])
+            if start < first_full:
+                parts.append(raw_query)
+                params.extend([currency, start_date, (first_full - timedelta(days=1)).strftime('%Y-%m-%d')])
+            last_full_end = last_full + relativedelta(months=1)
+            if last_full_end <= end:
+                parts.append(raw_query)
+                params.extend([currency, last_full_end.strftime('%Y-%m-%d'), end_date])
+        
+        month_column = "month, " if by_month else ""
+        query = f'''
+            SELECT {month_column}category, SUM(total_cents) AS total_cents, SUM(count) AS count
+            FROM ({" UNION ALL ".join(parts)})
+            GROUP BY {month_column}category
+        '''
+        conn = self._connect()
+        totals = pd.read_sql_query(query, conn, params=params)
+        
+        # The rollup says which other currencies occur in the range, so a
+        # single-currency ledger never reads raw rows here
+        foreign = pd.read_sql_query('''
+            SELECT date, substr(date, 1, 7) AS month, category, currency,
+                   SUM(amount_cents) AS total_cents, COUNT(*) AS count
+            FROM expenses
+            WHERE currency IN (
+                SELECT DISTINCT currency FROM monthly_category_totals
+                WHERE month_year BETWEEN ? AND ? AND currency != ? AND count > 0
+            ) AND date BETWEEN ? AND ?
+            GROUP BY date, category, currency
+        ''', conn, params=[start_date[:7], end_date[:7], currency, start_date, end_date])
+        if foreign.empty:
+            return totals.astype({'total_cents': 'int64', 'count': 'int64'})
+        
+        foreign['total_cents'] = self.convert_amounts(foreign, currency, amount_column='total_cents')
+        keys = ['month', 'category'] if by_month else ['category']
+        # An empty native frame has object columns, which concat would spread to the converted totals
+        frames = [frame for frame in (totals, foreign[keys + ['total_cents', 'count']]) if not frame.empty]
+        combined = pd.concat(frames).groupby(keys, as_index=False)[['total_cents', 'count']].sum()
+        return combined.astype({'total_cents': 'int64', 'count': 'int64'})
+    
+    def convert_amounts(self, frame, currency=None, amount_column='amount_cents'):
+        """Convert a frame's amounts in cents into `currency` (the base currency by default).
+        
+        frame needs date and currency columns. Every row uses the latest rate on
+        or before its date, found for all rows at once with merge_asof, and is
+        rounded to whole cents. Returns an int64 Series aligned with frame;
+        raises ValueError when a rate is missing.
+        """
+        currency = (currency or self.base_currency).upper()
+        amounts = frame[amount_column].astype('int64')
+        source = frame['currency'].astype(str)
+        foreign = source != currency
+        if not foreign.any():
+            return amounts
+        
+        dates = pd.to_datetime(frame.loc[foreign, 'date'])
+        rate_from = self._rates_on(dates, source[foreign])
+        rate_to = self._rates_on(dates, pd.Series(currency, index=dates.index))
+        converted = amounts.copy()
+        converted[foreign] = np.rint(amounts[foreign] * rate_from / rate_to).astype('int64')
+        return converted
+    
+    def _rates_on(self, dates, currencies):
+        """Value in DEFAULT_CURRENCY of one unit of each currency on each date"""
+        rates = pd.Series(1.0, index=dates.index)
+        needed = currencies != self.DEFAULT_CURRENCY
+        if not needed.any():
+            return rates
+        
+        lookup = pd.DataFrame({
+            'row': np.flatnonzero(needed.to_numpy()),
+            'date': dates[needed].astype('datetime64[ns]').to_numpy(),
+            'currency': currencies[needed].to_numpy(),
+        }).sort_values('date', kind='stable')
+        matched = pd.merge_asof(lookup, self._fx_rates(), on='date', by='currency', direction='backward')
+        
+        missing = matched['rate'].isna()
+        if missing.any():
+            first = matched[missing].iloc[0]
+            raise ValueError(f"No FX rate for {first['currency']} on or before {first['date']:%Y-%m-%d}")
+        values = rates.to_numpy(copy=True)
+        values[matched['row'].to_numpy()] = matched['rate'].to_numpy()
+        return pd.Series(values, index=dates.index)
+    
+    def _fx_rates(self):
+        """The FX rate table sorted by date, parsed once per file version and shared process-wide"""
+        if self.fx_rates_file is None:
+            raise ValueError("Converting between currencies needs an fx_rates_file")
+        path = self.fx_rates_file.resolve()
+        stamp = self._fx_stamp()
+        cached = self._fx_cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        
+        rates = pd.read_csv(path, usecols=['date', 'currency', 'rate'], dtype={'currency': str, 'rate': float})
+        rates['date'] = pd.to_datetime(rates['date']).astype('datetime64[ns]')
+        rates['currency'] = rates['currency'].str.strip().str.upper()
+        rates = rates.dropna().sort_values('date', kind='stable').reset_index(drop=True)
+        self._fx_cache[path] = (stamp, rates)
+        return rates
+    
+    def _fx_stamp(self):
+        """Identifies the FX rate file's current contents, for report cache keys"""
+        if self.fx_rates_file is None or not self.fx_rates_file.exists():
+            return None
+        stat = self.fx_rates_file.stat()
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _apply_rollup_delta(self, conn, expenses):
+        """Add a batch of new expenses to the rollup with one upsert per month/category/currency"""
+        delta = expenses.groupby([expenses['date'].str[:7], 'category', 'currency']).agg(
+            total_cents=('amount_cents', 'sum'),
+            count=('amount_cents', 'size')
+        ).reset_index()
+        conn.execute("UPDATE rollup_state SET revision = revision + 1")
+        conn.executemany('''
+            INSERT INTO monthly_category_totals (month_year, category, currency, total_cents, count, revision)
+            VALUES (?, ?, ?, ?, ?, (SELECT revision FROM rollup_state))
+            ON CONFLICT(month_year, category, currency) DO UPDATE
+            SET total_cents = total_cents + excluded.total_cents, count = count + excluded.count,
+                revision = excluded.revision
+        ''', delta.astype(object).values.tolist())
+    
+    def _accumulate_totals(self, chunks, by_month=False):
+        """Reduce expense chunks to per-category (and per-month) sums and counts.
+        
+        Produces the same frame as _category_totals while holding at most one chunk
+        plus the running totals in memory.
+        """
+        running = None
+        for chunk in chunks:
+            running = self._add_chunk_totals(running, chunk, by_month)
+        return self._finish_totals(running, by_month)
+    
+    @staticmethod
+    def _add_chunk_totals(running, chunk, by_month=False):
+        """Fold one chunk into running per-category (and per-month) totals"""
+        if chunk.empty:
+            return running
+        keys = ['month', 'category'] if by_month else ['category']
+        groups = [chunk['date'].dt.to_period('M').rename('month')] if by_month else []
+        groups.append(chunk['category'].astype(str))
+        partial = chunk.groupby(groups)['amount_cents'].agg(total_cents='sum', count='size').reset_index()
+        if running is None:
+            return partial
+        return pd.concat([running, partial]).groupby(keys, as_index=False)[['total_cents', 'count']].sum()
+    
+    @staticmethod
+    def _finish_totals(running, by_month=False):
+        """Turn running totals into the frame shape returned by _category_totals"""
+        keys = ['month', 'category'] if by_month else ['category']
+        if running is None:
+            return pd.DataFrame(columns=keys + ['total_cents', 'count'])
+        if by_month:
+            running['month'] = running['month'].astype(str)
+        return running
+    
+    @staticmethod
+    def _summary_from_totals(totals):
+        """Shape per-category totals in cents into the get_monthly_summary frame, in currency units"""
+        summary = pd.DataFrame({
+            'Total Amount': from_cents(totals['total_cents']),
+            'Transaction Count': totals['count'],
+            'Average Amount': from_cents(totals['total_cents'] / totals['count']),
+            'Total Transactions': totals['count']
+        })
+        summary.index = pd.Index(totals['category'], name='category')
+        return summary.round(2).sort_values('Total Amount', ascending=False)
+    
+    @staticmethod
+    def _trends_from_totals(totals):
+        """Shape per-month, per-category totals in cents into the get_spending_trends frames"""
+        totals = totals.assign(month=pd.PeriodIndex(totals['month'], freq='M'))
+        monthly_trends = totals.groupby('month').agg({
+            'total_cents': 'sum',
+            'count': 'sum'
+        })
+        monthly_trends.columns = ['Total Amount', 'Transaction Count']
+        monthly_trends['Total Amount'] = from_cents(monthly_trends['Total Amount']).round(2)
+        monthly_trends['Total Transactions'] = monthly_trends['Transaction Count']
+        
+        category_monthly = pd.pivot_table(
+            totals,
+            values='total_cents',
+            index='month',
+            columns='category',
+            aggfunc='sum'
+        ).fillna(0)
+        
+        return monthly_trends, from_cents(category_monthly)
+    
+    def rebuild_rollup(self):
+        """Recompute the monthly_category_totals rollup from the raw expenses"""
+        with self.transaction() as conn:
+            self.clear_cache()
+            conn.execute("DELETE FROM monthly_category_totals")
+            conn.execute("UPDATE rollup_state SET revision = revision + 1")
+            conn.execute('''
+                INSERT INTO monthly_category_totals (month_year, category, currency, total_cents, count, revision)
+                SELECT substr(date, 1, 7), category, currency, SUM(amount_cents), COUNT(*),
+                       (SELECT revision FROM rollup_state)
+                FROM expenses
+                GROUP BY substr(date, 1, 7), category, currency
+            ''')
+        self._log("Monthly rollup rebuilt!")
+    
+    def verify_rollup(self):
+        """Compare the rollup against the raw expenses; returns the mismatching rows"""
+        conn = self._connect()
+        rollup = pd.read_sql_query(
+            "SELECT month_year, category, currency, total_cents, count FROM monthly_category_totals WHERE count != 0",
+            conn
+        )
+        actual = pd.read_sql_query('''
+            SELECT substr(date, 1, 7) AS month_year, category, currency,
+                   SUM(amount_cents) AS total_cents, COUNT(*) AS count
+            FROM expenses
+            GROUP BY substr(date, 1, 7), category, currency
+        ''', conn)
+        
+        merged = actual.merge(rollup, on=['month_year', 'category', 'currency'], how='outer',
+                              suffixes=('_actual', '_rollup')).fillna(0)
+        mismatched = merged[
+            (merged['count_actual'] != merged['count_rollup']) |
+            (merged['total_cents_actual'] != merged['total_cents_rollup'])
+        ]
+        
+        if mismatched.empty:
+            self._log("Monthly rollup is consistent with expenses.")
+        else:
+            self._log(f"Monthly rollup has {len(mismatched)} mismatched month/category/currency rows; "
+                      "run rebuild_rollup().")
+        return mismatched
+    
+    def get_monthly_summary(self, year=None, month=None, aggregate='sql', currency=None):
+        """Get monthly summary of expenses, in `currency` (the base currency by default).
+        
+        aggregate='sql' computes the per-category totals inside SQLite, so the cost
+        grows with the number of categories; aggregate='chunks' streams the month
+        through iter_expenses with bounded memory; aggregate='pandas' loads every
+        row of the month and groups it in memory.
+        """
         if year is None:
             year = datetime.now().year
         if month is None:
             month = datetime.now().month
+        currency = (currency or self.base_currency).upper()
         
+        return self._cached(
+            ('monthly_summary', year, month, aggregate, currency, self._fx_stamp()),
+            [('expenses', f"{year}-{month:02d}")],
+            lambda: self._compute_monthly_summary(year, month, aggregate, currency)
+        )
+    
+    def _compute_monthly_summary(self, year, month, aggregate, currency):
         start_date = f"{year}-{month:02d}-01"
         end_date = (datetime(year, month, 1) + relativedelta(months=1) - timedelta(days=1)).strftime('%Y-%m-%d')
         
-        df = self.get_expenses_dataframe(start_date, end_date)
+        if aggregate in ('sql', 'chunks'):
+            if aggregate == 'sql':
+                totals = self._category_totals(start_date, end_date, currency=currency)
+            else:
+                chunks = self.iter_expenses(start_date, end_date,
+                                            columns=['amount_cents', 'category', 'date', 'currency'], derive=())
+                totals = self._accumulate_totals(
+                    chunk.assign(amount_cents=self.convert_amounts(chunk, currency)) for chunk in chunks
+                )
+            if totals.empty:
+                return pd.DataFrame()
+            return self._summary_from_totals(totals)
+        
+        df = self.get_expenses_dataframe(start_date, end_date,
+                                         columns=['id', 'amount_cents', 'category', 'date', 'currency'], derive=())
         
         if df.empty:
             return pd.DataFrame()
+        df['amount_cents'] = self.convert_amounts(df, currency)
         
-        summary = df.groupby('category').agg({
-            'amount': ['sum', 'count', 'mean'],
+        summary = df.groupby('category', observed=True).agg({
+            'amount_cents': ['sum', 'count', 'mean'],
             'id': 'count'
-        }).round(2)
+        })
         
         summary.columns = ['Total Amount', 'Transaction Count', 'Average Amount', 'Total Transactions']
+        summary[['Total Amount', 'Average Amount']] = from_cents(summary[['Total Amount', 'Average Amount']])
+        summary = summary.round(2)
+        summary.index = summary.index.astype(str)
         summary = summary.sort_values('Total Amount', ascending=False)
         
         return summary
     
-    def set_budget(self, category, amount, month_year=None):
-        """Set monthly budget for a category"""
+    def set_budget(self, category, amount, month_year=None, currency=None):
+        """Set monthly budget for a category (currency defaults to the tracker's base currency)"""
         if category not in self.categories:
-            print(f"Invalid category! Available categories: {', '.join(self.categories)}")
+            self._log(f"Invalid category! Available categories: {', '.join(self.categories)}")
+            return False
+        
+        currency = (currency or self.base_currency).upper()
+        if not self._is_currency_code(currency):
+            self._log(f"Invalid currency '{currency}'! Use a three-letter code such as USD or EUR.")
             return False
         
         if month_year is None:
             month_year = datetime.now().strftime('%Y-%m')
         
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-        
-        # Check if budget already exists for this category and month
-        cursor.execute('''
-            SELECT id FROM budgets 
-            WHERE category = ? AND month_year = ?
-        ''', (category, month_year))
-        
-        existing = cursor.fetchone()
-        
-        if existing:
-            cursor.execute('''
-                UPDATE budgets SET amount = ? 
-                WHERE category = ? AND month_year = ?
-            ''', (amount, category, month_year))
-        else:
-            cursor.execute('''
-                INSERT INTO budgets (category, amount, month_year)
-                VALUES (?, ?, ?)
-            ''', (category, amount, month_year))
-        
-        conn.commit()
-        conn.close()
-        print(f"Budget for {category} set to ${amount:.2f} for {month_year}")
+        cents = to_cents(amount)
+        with self.transaction() as conn:
+            conn.execute('''
+                INSERT INTO budgets (category, amount_cents, month_year, currency)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(month_year, category) DO UPDATE
+                SET amount_cents = excluded.amount_cents, currency = excluded.currency
+            ''', (category, cents, month_year, currency))
+        self._invalidate('budgets', [month_year])
+        
+        self._log(f"Budget for {category} set to {from_cents(cents):.2f} {currency} for {month_year}")
         return True
     
-    def get_budget_analysis(self, month_year=None):
-        """Analyze expenses against budgets"""
+    def get_budget_analysis(self, month_year=None, currency=None):
+        """Analyze expenses against budgets, both converted into `currency`"""
         if month_year is None:
             month_year = datetime.now().strftime('%Y-%m')
+        currency = (currency or self.base_currency).upper()
         
+        return self._cached(
+            ('budget_analysis', month_year, currency, self._fx_stamp()),
+            [('expenses', month_year), ('budgets', month_year)],
+            lambda: self._compute_budget_analysis(month_year, currency)
+        )
+    
+    def _compute_budget_analysis(self, month_year, currency):
         # Get expenses for the month
         year, month = map(int, month_year.split('-'))
-        expenses_summary = self.get_monthly_summary(year, month)
+        expenses_summary = self.get_monthly_summary(year, month, currency=currency)
         
         if expenses_summary.empty:
-            print("No expenses found for this month!")
+            self._log("No expenses found for this month!")
             return pd.DataFrame()
         
         # Get budgets for the month
-        conn = sqlite3.connect(self.db_file)
-        budgets_df = pd.read_sql_query('''
-            SELECT category, amount FROM budgets 
-            WHERE month_year = ?
-        ''', conn, params=[month_year])
-        conn.close()
+        budgets_df = self._read_budgets(month_year, currency)
         
         if budgets_df.empty:
-            print("No budgets set for this month!")
+            self._log("No budgets set for this month!")
             return expenses_summary
         
-        # Merge expenses with budgets
-        analysis = expenses_summary.merge(budgets_df, on='category', how='left')
-        analysis['Budget'] = analysis['amount']
+        return self._compare_to_budgets(expenses_summary, budgets_df)
+    
+    def _read_budgets(self, month_year, currency=None):
+        """Budgets set for one month in cents, converted into `currency` at the rates of the month's first day"""
+        budgets = pd.read_sql_query('''
+            SELECT category, amount_cents, currency, month_year || '-01' AS date FROM budgets 
+            WHERE month_year = ?
+        ''', self._connect(), params=[month_year])
+        budgets['amount_cents'] = self.convert_amounts(budgets, currency)
+        return budgets[['category', 'amount_cents']]
+    
+    @staticmethod
+    def _compare_to_budgets(expenses_summary, budgets_df):
+        """Join a monthly summary with the month's budgets"""
+        # Join on the category index so the result stays labelled by category
+        analysis = expenses_summary.join(budgets_df.set_index('category'), how='left')
+        analysis['Budget'] = from_cents(analysis['amount_cents'])
         analysis['Amount Spent'] = analysis['Total Amount']
         analysis['Remaining Budget'] = analysis['Budget'] - analysis['Amount Spent']
         analysis['Budget Utilization (%)'] = (analysis['Amount Spent'] / analysis['Budget'] * 100).round(1)
@@ -201,164 +1485,973 @@ class ExpenseTracker:
         analysis = analysis[['Budget', 'Amount Spent', 'Remaining Budget', 'Budget Utilization (%)', 'Transaction Count']]
         return analysis
     
+    def forecast_month_end(self, month_year=None, as_of=None, smoothing=0.3, currency=None):
+        """Project each category's month-end spending in `currency` and compare it with the budget.
+        
+        The run rate so far is blended with a historical baseline (the average of
+        the same calendar month in earlier years and an exponentially smoothed
+        monthly total), trusting the run rate more as the month goes on. as_of
+        defaults to today in the current month and to the month end otherwise;
+        a future month has nothing spent yet and is projected from history alone.
+        """
+        month = pd.Period(month_year or datetime.now().strftime('%Y-%m'), freq='M')
+        if as_of is None:
+            as_of = min(pd.Timestamp(datetime.now().date()), month.end_time.normalize())
+        days_elapsed = int(np.clip((pd.Timestamp(as_of) - month.start_time).days + 1, 0, month.days_in_month))
+        currency = (currency or self.base_currency).upper()
+        
+        # The baseline reads every earlier month, so any of them changing invalidates the forecast
+        first_month = self._connect().execute(
+            "SELECT MIN(month_year) FROM monthly_category_totals WHERE count > 0"
+        ).fetchone()[0]
+        first_month = min(pd.Period(first_month or month, freq='M'), month)
+        covered = pd.period_range(first_month, month, freq='M')
+        return self._cached(
+            ('forecast', str(month), days_elapsed, smoothing, currency, self._fx_stamp()),
+            [('expenses', month_year) for month_year in covered.strftime('%Y-%m')] + [('budgets', str(month))],
+            lambda: self._compute_forecast(month, first_month, days_elapsed, smoothing, currency)
+        )
+    
+    def _compute_forecast(self, month, first_month, days_elapsed, smoothing, currency):
+        history = pd.DataFrame(columns=['month', 'category', 'total_cents'])
+        if first_month < month:
+            history = self._category_totals(
+                first_month.start_time.strftime('%Y-%m-%d'),
+                (month.start_time - timedelta(days=1)).strftime('%Y-%m-%d'),
+                by_month=True,
+                currency=currency
+            )
+        spent = pd.Series(dtype=float)
+        if days_elapsed:
+            as_of = month.start_time + timedelta(days=days_elapsed - 1)
+            totals = self._category_totals(month.start_time.strftime('%Y-%m-%d'), as_of.strftime('%Y-%m-%d'),
+                                           currency=currency)
+            spent = from_cents(totals.set_index('category')['total_cents'].astype(float))
+        
+        if history.empty and spent.empty:
+            self._log("No data to forecast from!")
+            return pd.DataFrame()
+        
+        # Month x category matrix of past totals; every projection below runs on all categories at once
+        seasonal = smoothed = pd.Series(dtype=float)
+        if not history.empty:
+            monthly = from_cents(history.pivot_table(index='month', columns='category', values='total_cents',
+                                                     aggfunc='sum'))
+            monthly.index = pd.PeriodIndex(monthly.index, freq='M')
+            monthly = monthly.reindex(pd.period_range(monthly.index.min(), month - 1, freq='M')).fillna(0)
+            smoothed = monthly.ewm(alpha=smoothing, adjust=False).mean().iloc[-1]
+            seasonal = monthly[monthly.index.month == month.month].mean()
+        
+        forecast = pd.DataFrame({'Spent To Date': spent, 'Seasonal Average': seasonal, 'Smoothed Trend': smoothed})
+        forecast['Spent To Date'] = forecast['Spent To Date'].fillna(0)
+        days_in_month = month.days_in_month
+        progress = days_elapsed / days_in_month
+        
+        daily_now = forecast['Spent To Date'] / max(days_elapsed, 1)
+        baseline = forecast[['Seasonal Average', 'Smoothed Trend']].mean(axis=1)
+        daily_history = (baseline / days_in_month).fillna(daily_now)
+        forecast['Run Rate Projection'] = daily_now * days_in_month
+        forecast['Projected Month End'] = forecast['Spent To Date'] + (days_in_month - days_elapsed) * (
+            progress * daily_now + (1 - progress) * daily_history
+        )
+        
+        budgets = from_cents(self._read_budgets(str(month), currency).set_index('category')['amount_cents'])
+        forecast = forecast.join(budgets.rename('Budget'), how='outer')
+        forecast[['Spent To Date', 'Projected Month End']] = forecast[['Spent To Date', 'Projected Month End']].fillna(0)
+        forecast['Projected Remaining'] = forecast['Budget'] - forecast['Projected Month End']
+        forecast['Projected Utilization (%)'] = forecast['Projected Month End'] / forecast['Budget'] * 100
+        forecast['Status'] = np.select(
+            [forecast['Budget'].isna(),
+             forecast['Spent To Date'] > forecast['Budget'],
+             forecast['Projected Month End'] > forecast['Budget']],
+            ['No Budget', 'Over Budget', 'At Risk'],
+            default='On Track'
+        )
+        forecast.index.name = 'category'
+        return forecast.round(2).sort_values('Projected Month End', ascending=False)
+    
+    def get_chart_data(self, year=None, month=None):
+        """Precompute everything the spending charts draw.
+        
+        Like the other analytical reads, the totals come from the Parquet
+        snapshot when the tracker has one; otherwise from SQL aggregates.
+        """
+        totals = self._chart_totals_from_snapshot() if self.snapshot_dir else None
+        daily, payments = totals if totals is not None else self._chart_totals_from_sql()
+        daily['amount_cents'] = self.convert_amounts(daily)
+        payments['amount_cents'] = self.convert_amounts(payments)
+        # Summed in cents; the charts draw currency units
+        return {
+            'summary': self.get_monthly_summary(year, month),
+            'daily': from_cents(daily.groupby('date')['amount_cents'].sum()),
+            'payment_methods': from_cents(payments.groupby('payment_method')['amount_cents'].sum())
+        }
+    
+    def _chart_totals_from_snapshot(self):
+        """Per-day (daily) and per-method-and-day (payments) sums from the snapshot, or None without pyarrow"""
+        df = self._read_snapshot(columns=['date', 'currency', 'payment_method', 'amount_cents'])
+        if df is None:
+            return None
+        df['amount_cents'] = df['amount_cents'].astype('int64')
+        daily = df.groupby(['date', 'currency'], as_index=False)['amount_cents'].sum().sort_values('date')
+        payments = df.groupby(['payment_method', 'date', 'currency'], as_index=False)['amount_cents'].sum()
+        return daily, payments
+    
+    def _chart_totals_from_sql(self):
+        """The same sums as _chart_totals_from_snapshot, aggregated by SQLite"""
+        conn = self._connect()
+        # Per-day sums keep enough detail to apply daily FX rates before the final grouping
+        daily = pd.read_sql_query('''
+            SELECT date, currency, SUM(amount_cents) AS amount_cents
+            FROM expenses
+            GROUP BY date, currency
+            ORDER BY date
+        ''', conn, parse_dates=['date'])
+        payments = pd.read_sql_query('''
+            SELECT payment_method, date, currency, SUM(amount_cents) AS amount_cents
+            FROM expenses
+            WHERE currency != ?
+            GROUP BY payment_method, date, currency
+            UNION ALL
+            SELECT payment_method, NULL, ?, SUM(amount_cents)
+            FROM expenses
+            WHERE currency = ?
+            GROUP BY payment_method
+        ''', conn, params=[self.base_currency] * 3)
+        return daily, payments
+    
     def plot_spending_by_category(self, year=None, month=None):
         """Create visualization of spending by category"""
-        summary = self.get_monthly_summary(year, month)
+        data = self.get_chart_data(year, month)
         
-        if summary.empty:
-            print("No data to visualize!")
+        if data['summary'].empty:
+            self._log("No data to visualize!")
             return
         
-        plt.figure(figsize=(12, 8))
-        
-        # Pie chart
-        plt.subplot(2, 2, 1)
-        plt.pie(summary['Total Amount'], labels=summary.index, autopct='%1.1f%%', startangle=90)
-        plt.title('Spending Distribution by Category')
-        
-        # Bar chart
-        plt.subplot(2, 2, 2)
-        summary['Total Amount'].sort_values().plot(kind='barh')
-        plt.title('Spending by Category')
-        plt.xlabel('Amount ($)')
-        
-        # Time series of daily spending
-        plt.subplot(2, 2, 3)
-        df = self.get_expenses_dataframe()
-        if not df.empty:
-            daily_spending = df.groupby('date')['amount'].sum()
-            daily_spending.plot()
-            plt.title('Daily Spending Trend')
-            plt.xlabel('Date')
-            plt.ylabel('Amount ($)')
-            plt.xticks(rotation=45)
-        
-        # Payment method analysis
-        plt.subplot(2, 2, 4)
-        payment_methods = df.groupby('payment_method')['amount'].sum()
-        payment_methods.plot(kind='pie', autopct='%1.1f%%')
-        plt.title('Spending by Payment Method')
-        
-        plt.tight_layout()
+        plt = _pyplot()
+        _draw_spending_charts(plt.figure(figsize=(12, 8)), data)
         plt.show()
     
     def plot_budget_vs_actual(self, month_year=None):
         """Plot budget vs actual spending"""
         analysis = self.get_budget_analysis(month_year)
         
-        if analysis.empty:
-            print("No data for budget analysis!")
+        if analysis.empty or 'Budget' not in analysis:
+            self._log("No data for budget analysis!")
             return
         
-        plt.figure(figsize=(14, 6))
-        
-        # Budget vs Actual
-        plt.subplot(1, 2, 1)
-        categories = analysis.index
-        budget_values = analysis['Budget']
-        actual_values = analysis['Amount Spent']
-        
-        x = np.arange(len(categories))
-        width = 0.35
-        
-        plt.bar(x - width/2, budget_values, width, label='Budget', alpha=0.7)
-        plt.bar(x + width/2, actual_values, width, label='Actual', alpha=0.7)
-        
-        plt.xlabel('Categories')
-        plt.ylabel('Amount ($)')
-        plt.title('Budget vs Actual Spending')
-        plt.xticks(x, categories, rotation=45)
-        plt.legend()
-        
-        # Budget utilization
-        plt.subplot(1, 2, 2)
-        colors = ['green' if x <= 100 else 'red' for x in analysis['Budget Utilization (%)']]
-        plt.bar(categories, analysis['Budget Utilization (%)'], color=colors, alpha=0.7)
-        plt.axhline(y=100, color='red', linestyle='--', alpha=0.8)
-        plt.xlabel('Categories')
-        plt.ylabel('Utilization (%)')
-        plt.title('Budget Utilization Percentage')
-        plt.xticks(rotation=45)
-        
-        plt.tight_layout()
+        plt = _pyplot()
+        _draw_budget_charts(plt.figure(figsize=(14, 6)), analysis)
         plt.show()
     
-    def get_spending_trends(self, months=6):
-        """Analyze spending trends over time"""
+    def render_spending_by_category(self, year=None, month=None, fmt='png', cache_dir=None):
+        """Render the spending charts headlessly; returns image bytes, or None without data"""
+        data = self.get_chart_data(year, month)
+        if data['summary'].empty:
+            return None
+        return render_chart('spending', data, fmt, cache_dir)
+    
+    def render_budget_vs_actual(self, month_year=None, fmt='png', cache_dir=None):
+        """Render the budget charts headlessly; returns image bytes, or None without budgets"""
+        analysis = self.get_budget_analysis(month_year)
+        if analysis.empty or 'Budget' not in analysis:
+            return None
+        return render_chart('budget', analysis, fmt, cache_dir)
+    
+    def get_spending_trends(self, months=6, aggregate='sql', currency=None):
+        """Analyze spending trends over time in `currency` (aggregate works as in get_monthly_summary)"""
         end_date = datetime.now()
         start_date = end_date - relativedelta(months=months)
+        currency = (currency or self.base_currency).upper()
+        
+        covered = pd.period_range(start_date, end_date, freq='M').strftime('%Y-%m')
+        return self._cached(
+            ('spending_trends', months, aggregate, end_date.strftime('%Y-%m-%d'), currency, self._fx_stamp()),
+            [('expenses', month_year) for month_year in covered],
+            lambda: self._compute_spending_trends(start_date, end_date, aggregate, currency)
+        )
+    
+    def _compute_spending_trends(self, start_date, end_date, aggregate, currency):
+        if aggregate in ('sql', 'chunks'):
+            if aggregate == 'sql':
+                totals = self._category_totals(
+                    start_date.strftime('%Y-%m-%d'),
+                    end_date.strftime('%Y-%m-%d'),
+                    by_month=True,
+                    currency=currency
+                )
+            else:
+                chunks = self.iter_expenses(
+                    start_date.strftime('%Y-%m-%d'),
+                    end_date.strftime('%Y-%m-%d'),
+                    columns=['amount_cents', 'category', 'date', 'currency'],
+                    derive=()
+                )
+                totals = self._accumulate_totals(
+                    (chunk.assign(amount_cents=self.convert_amounts(chunk, currency)) for chunk in chunks),
+                    by_month=True
+                )
+            if totals.empty:
+                self._log("No data for trend analysis!")
+                return
+            return self._trends_from_totals(totals)
         
         df = self.get_expenses_dataframe(
             start_date.strftime('%Y-%m-%d'),
-            end_date.strftime('%Y-%m-%d')
+            end_date.strftime('%Y-%m-%d'),
+            columns=['id', 'amount_cents', 'category', 'date', 'currency'],
+            derive=('month',)
         )
         
         if df.empty:
-            print("No data for trend analysis!")
+            self._log("No data for trend analysis!")
             return
+        df['amount_cents'] = self.convert_amounts(df, currency)
         
         # Monthly trends
         monthly_trends = df.groupby('month').agg({
-            'amount': ['sum', 'count'],
+            'amount_cents': ['sum', 'count'],
             'id': 'count'
-        }).round(2)
+        })
         
         monthly_trends.columns = ['Total Amount', 'Transaction Count', 'Total Transactions']
+        monthly_trends['Total Amount'] = from_cents(monthly_trends['Total Amount']).round(2)
         
         # Category trends
         category_monthly = pd.pivot_table(
             df, 
-            values='amount', 
+            values='amount_cents', 
             index='month', 
             columns='category', 
-            aggfunc='sum'
+            aggfunc='sum',
+            observed=True
         ).fillna(0)
+        category_monthly.columns = category_monthly.columns.astype(str)
+        
+        return monthly_trends, from_cents(category_monthly)
+    
+    def detect_anomalies(self, threshold=3.0, window=30, min_history=10, chunksize=None):
+        """Flag expenses far above the recent spending in their category.
+        
+        Each expense gets a z-score against the `window` expenses of the same
+        category that came before it (once at least `min_history` exist); those
+        at or above `threshold` are returned, highest first.
+        """
+        anomalies, _ = self._scan_history(chunksize, anomalies=(threshold, window, min_history))
+        return anomalies
+    
+    def detect_recurring(self, min_occurrences=3, max_irregularity=0.25, chunksize=None):
+        """Find charges that repeat with the same description and amount on a regular schedule.
+        
+        A description/amount pair counts as recurring when it occurred at least
+        `min_occurrences` times, its average interval matches one of
+        RECURRING_PERIODS and the intervals vary by no more than
+        `max_irregularity` (standard deviation over mean).
+        """
+        _, recurring = self._scan_history(chunksize, recurring=(min_occurrences, max_irregularity))
+        return recurring
+    
+    def analyze_spending_patterns(self, threshold=3.0, window=30, min_history=10,
+                                  min_occurrences=3, max_irregularity=0.25, chunksize=None):
+        """Run detect_anomalies and detect_recurring in one pass; returns (anomalies, recurring)"""
+        return self._scan_history(chunksize, anomalies=(threshold, window, min_history),
+                                  recurring=(min_occurrences, max_irregularity))
+    
+    def _scan_history(self, chunksize, anomalies=None, recurring=None):
+        """Stream the whole history oldest first, folding each chunk into the requested detectors"""
+        history = None
+        flagged = []
+        intervals = None
+        chunks = self.iter_expenses(
+            chunksize=chunksize,
+            columns=['id', 'amount_cents', 'category', 'description', 'date', 'currency'],
+            derive=(),
+            ascending=True
+        )
+        for chunk in chunks:
+            if anomalies:
+                threshold, window, min_history = anomalies
+                # Scored in the base currency; recurring charges match on their original amount
+                converted = chunk.assign(amount_cents=self.convert_amounts(chunk))
+                history, scored = self._score_chunk_amounts(history, converted, window, min_history)
+                flagged.append(scored[scored['z_score'] >= threshold])
+            if recurring:
+                intervals = self._add_chunk_intervals(intervals, chunk)
+        
+        found_anomalies = found_recurring = None
+        if anomalies:
+            columns = ['id', 'date', 'category', 'description', 'amount', 'rolling_mean', 'rolling_std', 'z_score']
+            found = pd.concat(flagged, ignore_index=True) if flagged else pd.DataFrame(columns=columns + ['amount_cents'])
+            found['amount'] = from_cents(found['amount_cents'])
+            found[['rolling_mean', 'rolling_std']] = from_cents(found[['rolling_mean', 'rolling_std']])
+            found_anomalies = found[columns].sort_values('z_score', ascending=False, ignore_index=True).round(2)
+        if recurring:
+            found_recurring = self._finish_recurring(intervals, *recurring)
+        return found_anomalies, found_recurring
+    
+    @staticmethod
+    def _score_chunk_amounts(history, chunk, window, min_history):
+        """Z-score one chunk's amounts against trailing per-category rolling statistics.
+        
+        history holds the last `window` expenses of each category from earlier
+        chunks, so the rolling windows run on across chunk boundaries. Returns
+        the new history and the chunk's scored rows.
+        """
+        frame = chunk[['id', 'date', 'description', 'amount_cents']].assign(
+            category=chunk['category'].astype(str), carried=False
+        )
+        if history is not None:
+            frame = pd.concat([history, frame], ignore_index=True)
+        else:
+            frame = frame.reset_index(drop=True)
+        
+        # Compare each expense with the ones before it, not including itself
+        previous = frame.groupby('category')['amount_cents'].shift()
+        rolling = previous.groupby(frame['category']).rolling(window, min_periods=min_history)
+        frame['rolling_mean'] = rolling.mean().droplevel(0)
+        frame['rolling_std'] = rolling.std().droplevel(0)
+        frame['z_score'] = (frame['amount_cents'] - frame['rolling_mean']) / frame['rolling_std'].replace(0, np.nan)
         
-        return monthly_trends, category_monthly
+        history = frame.groupby('category').tail(window).assign(carried=True)
+        return history, frame[~frame['carried']]
     
-    def export_to_excel(self, filename="expense_report.xlsx"):
+    @staticmethod
+    def _add_chunk_intervals(running, chunk):
+        """Fold one chunk into per description/amount occurrence and interval statistics.
+        
+        Only the first/last day, count and sum of squared gaps are kept per pair;
+        the gap sum itself is last_day - first_day, since the chunks arrive in
+        date order.
+        """
+        description = chunk['description'].fillna('').astype(str).str.strip()
+        frame = pd.DataFrame({
+            'key': description.str.lower(),
+            'description': description,
+            'amount_cents': chunk['amount_cents'],
+            'category': chunk['category'].astype(str),
+            'day': chunk['date'].values.astype('datetime64[D]').astype('int64'),
+        })[description != '']
+        if frame.empty:
+            return running
+        
+        keys = ['key', 'amount_cents']
+        frame = frame.sort_values(keys + ['day'], kind='stable')
+        gaps = frame['day'] - frame.groupby(keys)['day'].shift()
+        partial = frame.assign(gap_sq=gaps ** 2).groupby(keys, as_index=False, sort=False).agg(
+            description=('description', 'first'),
+            category=('category', 'first'),
+            count=('day', 'size'),
+            first_day=('day', 'min'),
+            last_day=('day', 'max'),
+            gap_sq=('gap_sq', 'sum'),
+        )
+        if running is None:
+            return partial
+        
+        merged = running.merge(partial, on=keys, how='outer', suffixes=('', '_new'))
+        seen_before = merged['count'].notna()
+        # The gap between a pair's last occurrence so far and its first one in this chunk
+        bridge = (merged['first_day_new'] - merged['last_day']) ** 2
+        merged['gap_sq'] = merged['gap_sq'].fillna(0) + merged['gap_sq_new'].fillna(0) + bridge.fillna(0)
+        merged['count'] = merged['count'].fillna(0) + merged['count_new'].fillna(0)
+        merged['last_day'] = merged['last_day_new'].fillna(merged['last_day'])
+        for column in ('description', 'category', 'first_day'):
+            merged[column] = merged[column].where(seen_before, merged[f'{column}_new'])
+        return merged[partial.columns]
+    
+    def _finish_recurring(self, intervals, min_occurrences, max_irregularity):
+        """Turn interval statistics into the detect_recurring frame"""
+        columns = ['description', 'amount', 'category', 'period', 'occurrences', 'interval_days',
+                   'first_date', 'last_date', 'next_expected', 'active']
+        if intervals is None:
+            return pd.DataFrame(columns=columns)
+        
+        latest_day = intervals['last_day'].max()
+        candidates = intervals[intervals['count'] >= max(min_occurrences, 2)]
+        gap_count = candidates['count'] - 1
+        mean_gap = (candidates['last_day'] - candidates['first_day']) / gap_count
+        variance = (candidates['gap_sq'] / gap_count - mean_gap ** 2).clip(lower=0)
+        irregularity = np.sqrt(variance) / mean_gap.replace(0, np.nan)
+        
+        matches = [(mean_gap - days).abs() <= tolerance for _, days, tolerance in self.RECURRING_PERIODS]
+        period = np.select(matches, [name for name, _, _ in self.RECURRING_PERIODS], default='')
+        tolerance = np.select(matches, [tolerance for _, _, tolerance in self.RECURRING_PERIODS], default=0)
+        keep = (period != '') & (irregularity <= max_irregularity)
+        
+        next_day = candidates['last_day'] + mean_gap.round()
+        recurring = pd.DataFrame({
+            'description': candidates['description'],
+            'amount': from_cents(candidates['amount_cents']),
+            'category': candidates['category'],
+            'period': period,
+            'occurrences': candidates['count'].astype(int),
+            'interval_days': mean_gap.round(1),
+            'first_date': pd.to_datetime(candidates['first_day'], unit='D'),
+            'last_date': pd.to_datetime(candidates['last_day'], unit='D'),
+            'next_expected': pd.to_datetime(next_day, unit='D'),
+            # Still running if the next charge is not overdue relative to the newest expense
+            'active': next_day + tolerance >= latest_day,
+        })[keep]
+        return recurring.sort_values(['active', 'amount'], ascending=False, ignore_index=True)
+    
+    def export_to_excel(self, filename="expense_report.xlsx", engine=None):
         """Export expense data to Excel with multiple sheets"""
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            # Raw data
-            df = self.get_expenses_dataframe()
-            if not df.empty:
-                df.to_excel(writer, sheet_name='Raw Data', index=False)
-            
-            # Monthly summary
-            summary = self.get_monthly_summary()
-            if not summary.empty:
-                summary.to_excel(writer, sheet_name='Monthly Summary')
+        self.export_report(filename, format='xlsx', engine=engine)
+    
+    def export_report(self, path="expense_report.xlsx", format='xlsx', engine=None):
+        """Export raw data, monthly summary, budget analysis and trends.
+        
+        The ledger is read once: each chunk is written to the raw data output and
+        folded into the totals every other sheet is built from. format='xlsx'
+        writes one workbook (xlsxwriter in constant-memory mode when installed,
+        otherwise openpyxl); 'csv' and 'parquet' write a directory with one file
+        per sheet, which is much faster for large ledgers.
+        """
+        now = datetime.now()
+        month_start = pd.Timestamp(now.year, now.month, 1)
+        month_end = month_start + pd.offsets.MonthEnd(1)
+        trend_start = pd.Timestamp((now - relativedelta(months=6)).date())
+        today = pd.Timestamp(now.date())
+        
+        if format == 'xlsx':
+            sink = _ExcelReportSink(path, engine)
+        elif format == 'csv':
+            sink = _CsvReportSink(path)
+        elif format == 'parquet':
+            sink = _ParquetReportSink(path)
+        else:
+            raise ValueError(f"Unknown export format: {format}")
+        
+        month_totals = None
+        trend_totals = None
+        try:
+            for chunk in self.iter_expenses():
+                sink.write_raw(_with_display_amounts(chunk))
+                # Raw rows keep their own currency; the summary sheets are in the base currency
+                chunk = chunk.assign(amount_cents=self.convert_amounts(chunk))
+                dates = chunk['date']
+                month_totals = self._add_chunk_totals(
+                    month_totals, chunk[(dates >= month_start) & (dates <= month_end)])
+                trend_totals = self._add_chunk_totals(
+                    trend_totals, chunk[(dates >= trend_start) & (dates <= today)], by_month=True)
             
-            # Budget analysis
-            budget_analysis = self.get_budget_analysis()
-            if not budget_analysis.empty:
-                budget_analysis.to_excel(writer, sheet_name='Budget Analysis')
+            month_totals = self._finish_totals(month_totals)
+            if not month_totals.empty:
+                summary = self._summary_from_totals(month_totals)
+                sink.write_sheet('Monthly Summary', summary)
+                
+                budgets_df = self._read_budgets(now.strftime('%Y-%m'))
+                budget_analysis = self._compare_to_budgets(summary, budgets_df) if not budgets_df.empty else summary
+                sink.write_sheet('Budget Analysis', budget_analysis)
             
-            # Trends
-            trends, category_trends = self.get_spending_trends()
-            if not trends.empty:
-                trends.to_excel(writer, sheet_name='Monthly Trends')
-                category_trends.to_excel(writer, sheet_name='Category Trends')
-        
-        print(f"Data exported to {filename} successfully!")
+            trend_totals = self._finish_totals(trend_totals, by_month=True)
+            if not trend_totals.empty:
+                trends, category_trends = self._trends_from_totals(trend_totals)
+                sink.write_sheet('Monthly Trends', trends)
+                sink.write_sheet('Category Trends', category_trends)
+        finally:
+            sink.close()
+        
+        self._log(f"Data exported to {path} successfully!")
     
     def delete_expense(self, expense_id):
         """Delete an expense by ID"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
+        with self.transaction() as conn:
+            deleted = conn.execute("DELETE FROM expenses WHERE id = ? RETURNING date", (expense_id,)).fetchall()
         
-        cursor.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
+        if deleted:
+            self._invalidate('expenses', [str(deleted[0][0])[:7]])
+            self._log(f"Expense ID {expense_id} deleted successfully!")
+            return True
         
-        if cursor.rowcount > 0:
-            conn.commit()
-            print(f"Expense ID {expense_id} deleted successfully!")
+        self._log(f"Expense ID {expense_id} not found!")
+        return False
+
+def _apply_plot_style():
+    """Set the chart style once per process"""
+    global _plot_style_applied
+    if not _plot_style_applied:
+        import matplotlib
+        import seaborn as sns
+        matplotlib.style.use('seaborn-v0_8')
+        sns.set_palette("husl")
+        _plot_style_applied = True
+
+def _pyplot():
+    """Import pyplot on first use, with the chart style applied"""
+    _apply_plot_style()
+    import matplotlib.pyplot as plt
+    return plt
+
+def _draw_spending_charts(fig, data):
+    """Draw the category, daily trend and payment method charts onto a figure"""
+    summary = data['summary']
+    
+    # Pie chart
+    ax = fig.add_subplot(2, 2, 1)
+    ax.pie(summary['Total Amount'], labels=summary.index, autopct='%1.1f%%', startangle=90)
+    ax.set_title('Spending Distribution by Category')
+    
+    # Bar chart
+    ax = fig.add_subplot(2, 2, 2)
+    totals = summary['Total Amount'].sort_values()
+    ax.barh(totals.index, totals.values)
+    ax.set_title('Spending by Category')
+    ax.set_xlabel('Amount ($)')
+    
+    # Time series of daily spending
+    ax = fig.add_subplot(2, 2, 3)
+    daily_spending = data['daily']
+    if not daily_spending.empty:
+        ax.plot(daily_spending.index, daily_spending.values)
+        ax.set_title('Daily Spending Trend')
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Amount ($)')
+        ax.tick_params(axis='x', labelrotation=45)
+    
+    # Payment method analysis
+    ax = fig.add_subplot(2, 2, 4)
+    payment_methods = data['payment_methods']
+    if not payment_methods.empty:
+        ax.pie(payment_methods.values, labels=payment_methods.index, autopct='%1.1f%%')
+        ax.set_title('Spending by Payment Method')
+    
+    fig.tight_layout()
+
+def _draw_budget_charts(fig, analysis):
+    """Draw the budget vs actual and utilization charts onto a figure"""
+    # Budget vs Actual
+    ax = fig.add_subplot(1, 2, 1)
+    categories = analysis.index
+    x = np.arange(len(categories))
+    width = 0.35
+    
+    ax.bar(x - width/2, analysis['Budget'], width, label='Budget', alpha=0.7)
+    ax.bar(x + width/2, analysis['Amount Spent'], width, label='Actual', alpha=0.7)
+    
+    ax.set_xlabel('Categories')
+    ax.set_ylabel('Amount ($)')
+    ax.set_title('Budget vs Actual Spending')
+    ax.set_xticks(x, categories, rotation=45)
+    ax.legend()
+    
+    # Budget utilization
+    ax = fig.add_subplot(1, 2, 2)
+    colors = ['green' if value <= 100 else 'red' for value in analysis['Budget Utilization (%)']]
+    ax.bar(x, analysis['Budget Utilization (%)'], color=colors, alpha=0.7)
+    ax.axhline(y=100, color='red', linestyle='--', alpha=0.8)
+    ax.set_xlabel('Categories')
+    ax.set_ylabel('Utilization (%)')
+    ax.set_title('Budget Utilization Percentage')
+    ax.set_xticks(x, categories, rotation=45)
+    
+    fig.tight_layout()
+
+# Chart kinds renderable without pyplot: drawing function and figure size
+CHART_KINDS = {
+    'spending': (_draw_spending_charts, (12, 8)),
+    'budget': (_draw_budget_charts, (14, 6)),
+}
+
+def _chart_data_hash(kind, data, fmt):
+    """Stable hash of the data a chart is drawn from, used as its cache key"""
+    digest = hashlib.sha256(f"{kind}:{fmt}".encode())
+    items = data.items() if isinstance(data, dict) else [('data', data)]
+    for name, obj in sorted(items, key=lambda item: item[0]):
+        digest.update(name.encode())
+        if isinstance(obj, pd.DataFrame):
+            digest.update(repr(list(obj.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    return digest.hexdigest()
+
+def render_chart(kind, data, fmt='png', cache_dir=None, dpi=100):
+    """Render a chart from precomputed data with the Agg backend and return the image bytes.
+    
+    Uses matplotlib's object-oriented API only, so it is safe on servers and in
+    worker processes. With cache_dir, images are stored under a hash of their
+    input data and reused when the same data is rendered again.
+    """
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = Path(cache_dir) / f"{_chart_data_hash(kind, data, fmt)}.{fmt}"
+        if cache_path.exists():
+            return cache_path.read_bytes()
+    
+    _apply_plot_style()
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    draw, figsize = CHART_KINDS[kind]
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    draw(fig, data)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi)
+    image = buffer.getvalue()
+    
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(cache_path.name + f'.{os.getpid()}.tmp')
+        tmp_path.write_bytes(image)
+        os.replace(tmp_path, cache_path)
+    return image
+
+def _render_report_job(db_file, month_year, out_dir, fmt, cache_dir):
+    """Worker: render one ledger's charts for one month into out_dir"""
+    year, month = map(int, month_year.split('-'))
+    stem = f"{Path(db_file).stem}_{month_year}"
+    written = []
+    with ExpenseTracker(db_file, cache_size=0, verbose=False) as tracker:
+        charts = [
+            ('spending', tracker.render_spending_by_category(year, month, fmt, cache_dir)),
+            ('budget', tracker.render_budget_vs_actual(month_year, fmt, cache_dir)),
+        ]
+    for kind, image in charts:
+        if image is not None:
+            path = Path(out_dir) / f"{stem}_{kind}.{fmt}"
+            path.write_bytes(image)
+            written.append(str(path))
+    return written
+
+def render_reports(jobs, out_dir, fmt='png', processes=None, cache_dir=None):
+    """Render monthly chart reports for many (db_file, 'YYYY-MM') jobs in a process pool.
+    
+    Returns the paths of the images written.
+    """
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    jobs = list(jobs)
+    if processes == 1:
+        results = [_render_report_job(db_file, month_year, out_dir, fmt, cache_dir)
+                   for db_file, month_year in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(_render_report_job, db_file, month_year, out_dir, fmt, cache_dir)
+                       for db_file, month_year in jobs]
+            results = [future.result() for future in futures]
+    return [path for written in results for path in written]
+
+def _with_display_amounts(frame):
+    """Swap an expense frame's amount_cents column for amount in currency units, at the same position"""
+    position = frame.columns.get_loc('amount_cents')
+    amounts = from_cents(frame['amount_cents'])
+    frame = frame.drop(columns='amount_cents')
+    frame.insert(position, 'amount', amounts)
+    return frame
+
+def _flatten_frame(frame, index=True):
+    """Prepare a frame for export: index as columns, periods and categories as text"""
+    if index:
+        frame = frame.reset_index()
+    frame = frame.copy()
+    for column in frame.columns:
+        if isinstance(frame[column].dtype, (pd.PeriodDtype, pd.CategoricalDtype)):
+            frame[column] = frame[column].astype(str)
+    frame.columns = [str(column) for column in frame.columns]
+    return frame
+
+def _sheet_file_name(sheet_name):
+    return sheet_name.lower().replace(' ', '_')
+
+class _ExcelReportSink:
+    """Writes report sheets into one workbook, continuing raw data on new sheets at Excel's row limit"""
+    MAX_ROWS = 1048576
+    
+    def __init__(self, filename, engine=None):
+        if engine is None:
+            engine = 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') else 'openpyxl'
+        self.engine = engine
+        if engine == 'xlsxwriter':
+            import xlsxwriter
+            # Constant-memory mode flushes each row to disk, so rows must be written in order
+            self.book = xlsxwriter.Workbook(filename, {'constant_memory': True})
+            self.date_format = self.book.add_format({'num_format': 'yyyy-mm-dd'})
         else:
-            print(f"Expense ID {expense_id} not found!")
+            self.writer = pd.ExcelWriter(filename, engine=engine)
+        self.raw_sheets = 0
+        self.raw_row = self.MAX_ROWS
+    
+    def write_raw(self, chunk):
+        chunk = _flatten_frame(chunk, index=False)
+        while not chunk.empty:
+            if self.raw_row >= self.MAX_ROWS:
+                self.raw_sheets += 1
+                self.raw_sheet = 'Raw Data' if self.raw_sheets == 1 else f'Raw Data {self.raw_sheets}'
+                self._write(self.raw_sheet, chunk.iloc[:0], 0, header=True)
+                self.raw_row = 1
+            room = self.MAX_ROWS - self.raw_row
+            self._write(self.raw_sheet, chunk.iloc[:room], self.raw_row, header=False)
+            self.raw_row += min(room, len(chunk))
+            chunk = chunk.iloc[room:]
+    
+    def write_sheet(self, name, frame):
+        self._write(name, _flatten_frame(frame), 0, header=True)
+    
+    def _write(self, sheet_name, frame, startrow, header):
+        if self.engine != 'xlsxwriter':
+            frame.to_excel(self.writer, sheet_name=sheet_name, index=False, startrow=startrow, header=header)
+            return
         
-        conn.close()
+        worksheet = self.book.get_worksheet_by_name(sheet_name)
+        if worksheet is None:
+            worksheet = self.book.add_worksheet(sheet_name)
+            for position, column in enumerate(frame.columns):
+                if pd.api.types.is_datetime64_any_dtype(frame[column]):
+                    worksheet.set_column(position, position, 12, self.date_format)
+        if header:
+            worksheet.write_row(startrow, 0, list(frame.columns))
+            startrow += 1
+        values = frame.astype(object).where(frame.notna(), None).values.tolist()
+        for offset, row in enumerate(values):
+            worksheet.write_row(startrow + offset, 0, row)
+    
+    def close(self):
+        if self.engine == 'xlsxwriter':
+            self.book.close()
+        else:
+            self.writer.close()
+
+class _CsvReportSink:
+    """Writes each report sheet as a CSV file in a directory"""
+    
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.raw_path = self.directory / 'raw_data.csv'
+        self.raw_header = True
+    
+    def write_raw(self, chunk):
+        _flatten_frame(chunk, index=False).to_csv(
+            self.raw_path, mode='w' if self.raw_header else 'a', header=self.raw_header, index=False)
+        self.raw_header = False
+    
+    def write_sheet(self, name, frame):
+        _flatten_frame(frame).to_csv(self.directory / f'{_sheet_file_name(name)}.csv', index=False)
+    
+    def close(self):
+        pass
+
+class _ParquetReportSink:
+    """Writes each report sheet as a Parquet file in a directory (requires pyarrow)"""
+    
+    def __init__(self, directory):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.pq = pq
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.raw_writer = None
+    
+    def write_raw(self, chunk):
+        chunk = _flatten_frame(chunk, index=False)
+        if self.raw_writer is None:
+            table = self.pa.Table.from_pandas(chunk, preserve_index=False)
+            self.raw_writer = self.pq.ParquetWriter(self.directory / 'raw_data.parquet', table.schema)
+        else:
+            table = self.pa.Table.from_pandas(chunk, schema=self.raw_writer.schema, preserve_index=False)
+        self.raw_writer.write_table(table)
+    
+    def write_sheet(self, name, frame):
+        _flatten_frame(frame).to_parquet(self.directory / f'{_sheet_file_name(name)}.parquet', index=False)
+    
+    def close(self):
+        if self.raw_writer is not None:
+            self.raw_writer.close()
+
+def frame_to_records(frame):
+    """Convert a report DataFrame into JSON-ready rows"""
+    frame = frame.reset_index()
+    for column in frame.columns:
+        if isinstance(frame[column].dtype, pd.PeriodDtype):
+            frame[column] = frame[column].astype(str)
+    return json.loads(frame.to_json(orient='records', date_format='iso'))
+
+def _iso_date_arg(text):
+    if not ExpenseTracker._is_iso_date(text):
+        raise argparse.ArgumentTypeError(f"invalid date '{text}', expected YYYY-MM-DD")
+    return text
+
+class _CliParser(argparse.ArgumentParser):
+    """ArgumentParser that raises ValueError instead of printing usage and exiting,
+    so bad arguments get the same JSON error as any other failure"""
+    
+    def error(self, message):
+        raise ValueError(f"{self.prog}: {message}")
+
+def _build_cli_parser():
+    parser = _CliParser(
+        description="Personal expense tracker. Run without arguments for the interactive menu."
+    )
+    parser.add_argument('--db', default='expenses.db', help="ledger database file")
+    parser.add_argument('--base-currency', help="currency reports are converted into (default: USD)")
+    parser.add_argument('--fx-rates', help="CSV of daily rates: date,currency,rate (value of one unit in USD)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    add = commands.add_parser('add', help="add one expense")
+    add.add_argument('amount', type=float)
+    add.add_argument('category', choices=ExpenseTracker.CATEGORIES)
+    add.add_argument('--description', default='')
+    add.add_argument('--date', type=_iso_date_arg, help="YYYY-MM-DD (default: today)")
+    add.add_argument('--payment-method', default='Cash')
+    add.add_argument('--currency', help="three-letter code (default: the base currency)")
+    
+    import_parser = commands.add_parser('import', help="bulk import a .csv or .parquet file")
+    import_parser.add_argument('file')
+    import_parser.add_argument('--chunk-size', type=int)
+    
+    summary = commands.add_parser('summary', help="monthly summary by category")
+    summary.add_argument('--year', type=int)
+    summary.add_argument('--month', type=int)
+    
+    budget = commands.add_parser('budget', help="budget vs actual for a month")
+    budget.add_argument('--month-year', help="YYYY-MM (default: current month)")
+    
+    set_budget = commands.add_parser('set-budget', help="set a category budget for a month")
+    set_budget.add_argument('category', choices=ExpenseTracker.CATEGORIES)
+    set_budget.add_argument('amount', type=float)
+    set_budget.add_argument('--month-year', help="YYYY-MM (default: current month)")
+    set_budget.add_argument('--currency', help="three-letter code (default: the base currency)")
+    
+    trends = commands.add_parser('trends', help="monthly spending trends")
+    trends.add_argument('--months', type=int, default=6)
+    
+    export = commands.add_parser('export', help="export the full report")
+    export.add_argument('path', nargs='?', default='expense_report.xlsx')
+    export.add_argument('--format', choices=('xlsx', 'csv', 'parquet'), default='xlsx')
+    
+    search = commands.add_parser('search', help="full-text search of expense descriptions")
+    search.add_argument('query')
+    search.add_argument('--start-date', help="YYYY-MM-DD")
+    search.add_argument('--end-date', help="YYYY-MM-DD")
+    search.add_argument('--category', choices=ExpenseTracker.CATEGORIES)
+    search.add_argument('--limit', type=int, default=50)
+    search.add_argument('--offset', type=int, default=0)
+    
+    delete = commands.add_parser('delete', help="delete an expense by id")
+    delete.add_argument('id', type=int)
+    
+    batch = commands.add_parser(
+        'batch',
+        help="run one command per line from a file ('-' for stdin) in a single transaction"
+    )
+    batch.add_argument('file')
+    
+    commands.add_parser('menu', help="the interactive menu (the default without arguments), using --db/--fx-rates")
+    return parser
+
+def _run_cli_command(tracker, args):
+    """Execute one parsed command and return its JSON-ready result.
+    
+    Commands that fail raise ValueError, so a batch rolls back as a whole.
+    """
+    if args.command == 'add':
+        if not tracker.add_expense(args.amount, args.category, args.description, args.date, args.payment_method,
+                                   args.currency):
+            raise ValueError(f"Invalid currency: {args.currency}")
+        return {}
+    if args.command == 'import':
+        result = tracker.import_file(args.file, args.chunk_size)
+        if result is None:
+            raise ValueError(f"Could not import {args.file}")
+        return {
+            'inserted': result['inserted'],
+            'rejected': len(result['rejected']),
+            'seconds': round(result['seconds'], 3),
+        }
+    if args.command == 'summary':
+        return {'rows': frame_to_records(tracker.get_monthly_summary(args.year, args.month))}
+    if args.command == 'budget':
+        return {'rows': frame_to_records(tracker.get_budget_analysis(args.month_year))}
+    if args.command == 'set-budget':
+        if not tracker.set_budget(args.category, args.amount, args.month_year, args.currency):
+            raise ValueError(f"Invalid currency: {args.currency}")
+        return {}
+    if args.command == 'trends':
+        result = tracker.get_spending_trends(args.months)
+        if result is None:
+            return {'monthly': [], 'by_category': []}
+        monthly, by_category = result
+        return {'monthly': frame_to_records(monthly), 'by_category': frame_to_records(by_category)}
+    if args.command == 'export':
+        tracker.export_report(args.path, format=args.format)
+        return {'path': args.path}
+    if args.command == 'search':
+        results = tracker.search_expenses(args.query, args.start_date, args.end_date, args.category,
+                                          args.limit, args.offset)
+        return {'rows': frame_to_records(_with_display_amounts(results).set_index('id'))}
+    if args.command == 'delete':
+        if not tracker.delete_expense(args.id):
+            raise ValueError(f"Expense ID {args.id} not found")
+        return {}
+    raise ValueError(f"Unknown command: {args.command}")
 
-def main():
-    tracker = ExpenseTracker()
+def _parse_batch(parser, filename):
+    """Parse every line of a batch file up front so a typo fails before anything runs"""
+    handle = sys.stdin if filename == '-' else open(filename)
+    try:
+        lines = [line.strip() for line in handle]
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+    
+    commands = []
+    for number, line in enumerate(lines, 1):
+        if not line or line.startswith('#'):
+            continue
+        try:
+            args = parser.parse_args(shlex.split(line))
+        except ValueError as error:
+            raise ValueError(f"line {number}: cannot parse '{line}': {error}")
+        if args.command in ('batch', 'menu'):
+            raise ValueError(f"line {number}: '{args.command}' cannot run in a batch file")
+        commands.append(args)
+    return commands
+
+def run_cli(argv):
+    """Run CLI arguments and print one JSON document; returns the process exit code.
+    
+    A batch runs all its commands in one transaction and rolls everything back
+    if any of them fails. Exports read committed data through their own
+    connection, so a batch runs them after it commits.
+    """
+    parser = _build_cli_parser()
+    try:
+        args = parser.parse_args(argv)
+        if args.command == 'menu':
+            with ExpenseTracker(args.db, base_currency=args.base_currency, fx_rates_file=args.fx_rates) as tracker:
+                _run_menu(tracker)
+            return 0
+        
+        with ExpenseTracker(args.db, verbose=False, base_currency=args.base_currency,
+                            fx_rates_file=args.fx_rates) as tracker:
+            if args.command != 'batch':
+                output = {'command': args.command, **_run_cli_command(tracker, args)}
+            else:
+                commands = _parse_batch(parser, args.file)
+                results = [None] * len(commands)
+                with tracker.transaction():
+                    for i, command in enumerate(commands):
+                        if command.command != 'export':
+                            results[i] = {'command': command.command, **_run_cli_command(tracker, command)}
+                for i, command in enumerate(commands):
+                    if command.command == 'export':
+                        results[i] = {'command': command.command, **_run_cli_command(tracker, command)}
+                output = {'command': 'batch', 'results': results}
+    except (ValueError, OSError, sqlite3.Error) as error:
+        print(json.dumps({'ok': False, 'error': str(error)}))
+        return 1
+    
+    print(json.dumps({'ok': True, **output}))
+    return 0
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        sys.exit(run_cli(argv))
+    with ExpenseTracker() as tracker:
+        _run_menu(tracker)
+
+def _run_menu(tracker):
     
     while True:
         print("\n=== Personal Expense Tracker ===")
@@ -371,129 +2464,161 @@ def main():
         print("7. Export to Excel")
         print("8. View All Expenses")
         print("9. Delete Expense")
-        print("10. Exit")
-        
-        choice = input("\nChoose an option (1-10): ").strip()
-        
-        if choice == '1':
-            print("\nAdd New Expense:")
-            amount = float(input("Amount: $"))
-            print("\nAvailable Categories:")
-            for i, category in enumerate(tracker.categories, 1):
-                print(f"{i}. {category}")
-            
-            cat_choice = int(input("Select category (number): ")) - 1
-            if 0 <= cat_choice < len(tracker.categories):
-                category = tracker.categories[cat_choice]
-                description = input("Description (optional): ")
-                payment_method = input("Payment method (default: Cash): ") or "Cash"
+        print("10. Detect Unusual & Recurring Expenses")
+        print("11. Exit")
+        
+        choice = input("\nChoose an option (1-11): ").strip()
+        
+        # Reports raise ValueError for problems such as a missing FX rate; report them and keep the menu open
+        try:
+            if choice == '1':
+                print("\nAdd New Expense:")
+                amount = float(input("Amount: $"))
+                print("\nAvailable Categories:")
+                for i, category in enumerate(tracker.categories, 1):
+                    print(f"{i}. {category}")
                 
-                tracker.add_expense(amount, category, description, payment_method=payment_method)
-            else:
-                print("Invalid category selection!")
-        
-        elif choice == '2':
-            year = input("Year (YYYY) or press enter for current year: ")
-            month = input("Month (1-12) or press enter for current month: ")
+                cat_choice = int(input("Select category (number): ")) - 1
+                if 0 <= cat_choice < len(tracker.categories):
+                    category = tracker.categories[cat_choice]
+                    description = input("Description (optional): ")
+                    payment_method = input("Payment method (default: Cash): ") or "Cash"
+                    # Other currencies can only be reported on with an FX rates file (menu --fx-rates)
+                    currency = None
+                    if tracker.fx_rates_file:
+                        currency = input(f"Currency (default: {tracker.base_currency}): ").strip() or None
+                    
+                    tracker.add_expense(amount, category, description, payment_method=payment_method, currency=currency)
+                else:
+                    print("Invalid category selection!")
             
-            year = int(year) if year else None
-            month = int(month) if month else None
+            elif choice == '2':
+                year = input("Year (YYYY) or press enter for current year: ")
+                month = input("Month (1-12) or press enter for current month: ")
+                
+                year = int(year) if year else None
+                month = int(month) if month else None
+                
+                summary = tracker.get_monthly_summary(year, month)
+                if not summary.empty:
+                    print("\nMonthly Expense Summary:")
+                    print("=" * 50)
+                    print(summary)
+                    print(f"\nTotal Spending: ${summary['Total Amount'].sum():.2f}")
+                else:
+                    print("No expenses found for the specified period!")
             
-            summary = tracker.get_monthly_summary(year, month)
-            if not summary.empty:
-                print("\nMonthly Expense Summary:")
-                print("=" * 50)
-                print(summary)
-                print(f"\nTotal Spending: ${summary['Total Amount'].sum():.2f}")
-            else:
-                print("No expenses found for the specified period!")
-        
-        elif choice == '3':
-            print("\nSet Monthly Budget:")
-            print("Available Categories:")
-            for i, category in enumerate(tracker.categories, 1):
-                print(f"{i}. {category}")
+            elif choice == '3':
+                print("\nSet Monthly Budget:")
+                print("Available Categories:")
+                for i, category in enumerate(tracker.categories, 1):
+                    print(f"{i}. {category}")
+                
+                cat_choice = int(input("Select category (number): ")) - 1
+                if 0 <= cat_choice < len(tracker.categories):
+                    category = tracker.categories[cat_choice]
+                    amount = float(input("Budget amount: $"))
+                    month_year = input("Month-Year (YYYY-MM) or press enter for current: ") or None
+                    
+                    tracker.set_budget(category, amount, month_year)
+                else:
+                    print("Invalid category selection!")
             
-            cat_choice = int(input("Select category (number): ")) - 1
-            if 0 <= cat_choice < len(tracker.categories):
-                category = tracker.categories[cat_choice]
-                amount = float(input("Budget amount: $"))
+            elif choice == '4':
                 month_year = input("Month-Year (YYYY-MM) or press enter for current: ") or None
+                analysis = tracker.get_budget_analysis(month_year)
+                if not analysis.empty:
+                    print("\nBudget vs Actual Analysis:")
+                    print("=" * 60)
+                    print(analysis)
+                    tracker.plot_budget_vs_actual(month_year)
+                else:
+                    print("No data available for analysis!")
+            
+            elif choice == '5':
+                year = input("Year (YYYY) or press enter for current year: ")
+                month = input("Month (1-12) or press enter for current month: ")
                 
-                tracker.set_budget(category, amount, month_year)
-            else:
-                print("Invalid category selection!")
-        
-        elif choice == '4':
-            month_year = input("Month-Year (YYYY-MM) or press enter for current: ") or None
-            analysis = tracker.get_budget_analysis(month_year)
-            if not analysis.empty:
-                print("\nBudget vs Actual Analysis:")
-                print("=" * 60)
-                print(analysis)
-                tracker.plot_budget_vs_actual(month_year)
-            else:
-                print("No data available for analysis!")
-        
-        elif choice == '5':
-            year = input("Year (YYYY) or press enter for current year: ")
-            month = input("Month (1-12) or press enter for current month: ")
+                year = int(year) if year else None
+                month = int(month) if month else None
+                
+                tracker.plot_spending_by_category(year, month)
+            
+            elif choice == '6':
+                months = int(input("Number of months to analyze (default 6): ") or 6)
+                trends, category_trends = tracker.get_spending_trends(months)
+                
+                if not trends.empty:
+                    print("\nSpending Trends (Last {} months):".format(months))
+                    print("=" * 40)
+                    print(trends)
+                    
+                    # Plot trends
+                    plt = _pyplot()
+                    plt.figure(figsize=(12, 8))
+                    trends['Total Amount'].plot(kind='line', marker='o')
+                    plt.title('Monthly Spending Trend')
+                    plt.xlabel('Month')
+                    plt.ylabel('Amount ($)')
+                    plt.xticks(rotation=45)
+                    plt.grid(True, alpha=0.3)
+                    plt.tight_layout()
+                    plt.show()
             
-            year = int(year) if year else None
-            month = int(month) if month else None
+            elif choice == '7':
+                filename = input("Export filename (default: expense_report.xlsx): ") or "expense_report.xlsx"
+                tracker.export_to_excel(filename)
             
-            tracker.plot_spending_by_category(year, month)
-        
-        elif choice == '6':
-            months = int(input("Number of months to analyze (default 6): ") or 6)
-            trends, category_trends = tracker.get_spending_trends(months)
+            elif choice == '8':
+                df = tracker.get_expenses_dataframe(
+                    columns=['id', 'date', 'category', 'amount_cents', 'description', 'payment_method'],
+                    derive=()
+                )
+                df = _with_display_amounts(df)
+                if not df.empty:
+                    print("\nAll Expenses:")
+                    print("=" * 80)
+                    # Display only recent expenses for readability
+                    recent_expenses = df.head(20)[['id', 'date', 'category', 'amount', 'description', 'payment_method']]
+                    print(recent_expenses.to_string(index=False))
+                    if len(df) > 20:
+                        print(f"\n... and {len(df) - 20} more expenses")
+                else:
+                    print("No expenses found!")
             
-            if not trends.empty:
-                print("\nSpending Trends (Last {} months):".format(months))
-                print("=" * 40)
-                print(trends)
+            elif choice == '9':
+                expense_id = input("Enter expense ID to delete: ")
+                if expense_id.isdigit():
+                    tracker.delete_expense(int(expense_id))
+                else:
+                    print("Invalid expense ID!")
+            
+            elif choice == '10':
+                anomalies, recurring = tracker.analyze_spending_patterns()
+                if not anomalies.empty:
+                    print("\nUnusual Expenses (highest z-score first):")
+                    print("=" * 80)
+                    print(anomalies.head(20).to_string(index=False))
+                    if len(anomalies) > 20:
+                        print(f"\n... and {len(anomalies) - 20} more")
+                else:
+                    print("No unusual expenses found!")
                 
-                # Plot trends
-                plt.figure(figsize=(12, 8))
-                trends['Total Amount'].plot(kind='line', marker='o')
-                plt.title('Monthly Spending Trend')
-                plt.xlabel('Month')
-                plt.ylabel('Amount ($)')
-                plt.xticks(rotation=45)
-                plt.grid(True, alpha=0.3)
-                plt.tight_layout()
-                plt.show()
-        
-        elif choice == '7':
-            filename = input("Export filename (default: expense_report.xlsx): ") or "expense_report.xlsx"
-            tracker.export_to_excel(filename)
-        
-        elif choice == '8':
-            df = tracker.get_expenses_dataframe()
-            if not df.empty:
-                print("\nAll Expenses:")
-                print("=" * 80)
-                # Display only recent expenses for readability
-                recent_expenses = df.head(20)[['id', 'date', 'category', 'amount', 'description', 'payment_method']]
-                print(recent_expenses.to_string(index=False))
-                if len(df) > 20:
-                    print(f"\n... and {len(df) - 20} more expenses")
-            else:
-                print("No expenses found!")
-        
-        elif choice == '9':
-            expense_id = input("Enter expense ID to delete: ")
-            if expense_id.isdigit():
-                tracker.delete_expense(int(expense_id))
+                if not recurring.empty:
+                    print("\nRecurring Charges:")
+                    print("=" * 80)
+                    print(recurring.to_string(index=False))
+                else:
+                    print("No recurring charges found!")
+            
+            elif choice == '11':
+                print("Goodbye! Keep tracking your expenses!")
+                break
+            
             else:
-                print("Invalid expense ID!")
-        
-        elif choice == '10':
-            print("Goodbye! Keep tracking your expenses!")
-            break
-        
-        else:
-            print("Invalid choice!")
+                print("Invalid choice!")
+        except ValueError as error:
+            print(f"Error: {error}")
 
 if __name__ == "__main__":
     # Install required packages first:
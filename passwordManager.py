@@ -1,19 +1,56 @@
 import sqlite3
 import os
+import sys
 import base64
+import collections
+import csv
+import itertools
 import getpass
 import datetime
+import argparse
+import json
+import re
+import socket
+import socketserver
+import stat
+import struct
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+from cryptography.exceptions import UnsupportedAlgorithm
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 from cryptography.hazmat.primitives import hashes
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.backends import default_backend
 
 DB_FILE = "vault.db"
-KDF_ITERATIONS = 390000  # strong iteration count
+KDF_ITERATIONS = 390000  # strong iteration count; also the PBKDF2 floor for calibration
+AGENT_IDLE_TIMEOUT = 900  # seconds without requests before the agent forgets the key and exits
+UNLOCK_TARGET_MS = 500  # unlock time new vaults, `rekey` and `passwd` calibrate their KDF for
+KDFS = ("pbkdf2-sha256", "scrypt", "argon2id")
+SCRYPT_MAX_MEMORY = 256 * 1024 * 1024  # past this, scrypt grows its cost through p instead of n
+ARGON2_MEMORY_KIB = 64 * 1024
+ARGON2_LANES = 4
+ROTATION_BATCH_SIZE = 1000  # entries re-encrypted per transaction when rotating keys
+SEARCH_PAGE_SIZE = 20
+TRANSFER_CHUNK_SIZE = 1000  # entries per import batch and per export chunk
+EXPORT_FORMAT = "vault-export"
+EXPORT_VERSION = 1
+
+# Header names used by browser and password manager CSV exports (Chrome, Firefox, Bitwarden, 1Password, ...)
+CSV_COLUMNS = {
+    "name": ("name", "title"),
+    "url": ("url", "login_uri", "hostname", "origin_url", "website"),
+    "username": ("username", "login_username", "user", "email", "login"),
+    "password": ("password", "login_password"),
+    "notes": ("notes", "note", "extra", "comments"),
+}
 
 
 def init_db():
-    """Create DB and tables if not exist. Store a random salt in meta table on first run."""
+    """Create DB and tables if not exist. Store a random salt and calibrated KDF in meta on first run."""
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
     c.execute(
@@ -37,46 +74,226 @@ def init_db():
         )
         """
     )
+    # A key rotation in progress: the new key's salt and KDF, a token proving the new password,
+    # and the highest entry id already re-encrypted under it
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rotation (
+            id INTEGER PRIMARY KEY CHECK(id=1),
+            salt BLOB NOT NULL,
+            kdf TEXT NOT NULL,
+            kdf_params TEXT NOT NULL,
+            verifier BLOB NOT NULL,
+            last_id INTEGER NOT NULL,
+            started_at TEXT NOT NULL
+        )
+        """
+    )
+    fts5 = c.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0]
+    if fts5 and not has_search_index(conn):
+        _create_search_index(c)
+        conn.commit()
+    # Vaults from before KDF selection are PBKDF2 with the iteration count in kdf_iterations
+    columns = {row[1] for row in c.execute("PRAGMA table_info(meta)")}
+    if "kdf" not in columns:
+        c.execute("ALTER TABLE meta ADD COLUMN kdf TEXT NOT NULL DEFAULT 'pbkdf2-sha256'")
+        c.execute("ALTER TABLE meta ADD COLUMN kdf_params TEXT")
+        c.execute("SELECT kdf_iterations FROM meta WHERE id = 1")
+        row = c.fetchone()
+        if row is not None:
+            c.execute("UPDATE meta SET kdf_params = ? WHERE id = 1", (json.dumps({"iterations": row[0]}),))
+        conn.commit()
     # Ensure single-row meta exists
     c.execute("SELECT salt FROM meta WHERE id = 1")
     row = c.fetchone()
     if row is None:
-        salt = os.urandom(16)
+        kdf = default_kdf()
+        print("Calibrating key derivation for this machine...")
+        params = calibrate_kdf(kdf)
+        iterations = params["iterations"] if kdf == "pbkdf2-sha256" else None
         c.execute(
-            "INSERT INTO meta (id, salt, kdf_iterations) VALUES (1, ?, ?)",
-            (salt, KDF_ITERATIONS),
+            "INSERT INTO meta (id, salt, kdf_iterations, kdf, kdf_params) VALUES (1, ?, ?, ?, ?)",
+            (os.urandom(16), iterations, kdf, json.dumps(params)),
         )
         conn.commit()
     conn.close()
 
 
+def _create_search_index(c):
+    """Build entries_fts, a full-text index of each entry's name and username.
+
+    The index reads its text from the entries table (content='entries'), so it
+    adds tokens only, and the triggers below keep it current. The password
+    column is ciphertext and notes may hold secrets, so neither is indexed.
+    """
+    statements = (
+        """
+        CREATE VIRTUAL TABLE entries_fts USING fts5(
+            name, username, content='entries', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        "INSERT INTO entries_fts (entries_fts) VALUES ('rebuild')",
+        """
+        CREATE TRIGGER trg_entries_fts_insert AFTER INSERT ON entries
+        BEGIN
+            INSERT INTO entries_fts (rowid, name, username) VALUES (NEW.id, NEW.name, NEW.username);
+        END
+        """,
+        """
+        CREATE TRIGGER trg_entries_fts_delete AFTER DELETE ON entries
+        BEGIN
+            INSERT INTO entries_fts (entries_fts, rowid, name, username)
+            VALUES ('delete', OLD.id, OLD.name, OLD.username);
+        END
+        """,
+        # Limited to name/username so rekey and passwd, which rewrite every password, leave the index alone
+        """
+        CREATE TRIGGER trg_entries_fts_update AFTER UPDATE OF name, username ON entries
+        BEGIN
+            INSERT INTO entries_fts (entries_fts, rowid, name, username)
+            VALUES ('delete', OLD.id, OLD.name, OLD.username);
+            INSERT INTO entries_fts (rowid, name, username) VALUES (NEW.id, NEW.name, NEW.username);
+        END
+        """,
+    )
+    for statement in statements:
+        c.execute(statement)
+
+
+def has_search_index(conn) -> bool:
+    """Whether the entries_fts index exists (SQLite may lack FTS5)."""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'entries_fts'").fetchone() is not None
+
+
 def get_meta():
+    """Return the vault's (salt, kdf name, kdf parameters)."""
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
-    c.execute("SELECT salt, kdf_iterations FROM meta WHERE id = 1")
+    c.execute("SELECT salt, kdf, kdf_params FROM meta WHERE id = 1")
     row = c.fetchone()
     conn.close()
     if not row:
         raise RuntimeError("Database meta not initialized.")
-    return row[0], row[1]
+    return row[0], row[1], json.loads(row[2])
 
 
-def derive_key(master_password: str, salt: bytes, iterations: int) -> bytes:
-    """Derive a 32-byte key from master_password using PBKDF2-HMAC-SHA256."""
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(), length=32, salt=salt, iterations=iterations, backend=default_backend()
-    )
-    key = kdf.derive(master_password.encode("utf-8"))
+def argon2_available() -> bool:
+    """Argon2id needs cryptography 44+ built against an OpenSSL that provides it."""
+    try:
+        from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+
+        Argon2id(salt=b"\0" * 16, length=32, iterations=1, lanes=1, memory_cost=8)
+    except (ImportError, UnsupportedAlgorithm):
+        return False
+    return True
+
+
+def default_kdf() -> str:
+    return "argon2id" if argon2_available() else "scrypt"
+
+
+def _kdf(kdf: str, params: dict, salt: bytes):
+    if kdf == "pbkdf2-sha256":
+        return PBKDF2HMAC(
+            algorithm=hashes.SHA256(), length=32, salt=salt, iterations=params["iterations"],
+            backend=default_backend(),
+        )
+    if kdf == "scrypt":
+        return Scrypt(
+            salt=salt, length=32, n=params["n"], r=params["r"], p=params["p"], backend=default_backend()
+        )
+    if kdf == "argon2id":
+        from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+
+        return Argon2id(
+            salt=salt, length=32, iterations=params["iterations"], lanes=params["lanes"],
+            memory_cost=params["memory_cost"],
+        )
+    raise ValueError(f"Unknown KDF: {kdf}")
+
+
+def derive_key(master_password: str, salt: bytes, kdf: str, params: dict) -> bytes:
+    """Derive a 32-byte key from master_password with PBKDF2-HMAC-SHA256, scrypt or Argon2id."""
+    key = _kdf(kdf, params, salt).derive(master_password.encode("utf-8"))
     return base64.urlsafe_b64encode(key)  # Fernet expects a urlsafe base64-encoded key
 
 
+def time_kdf(kdf: str, params: dict, runs: int = 1) -> float:
+    """Seconds one derivation with these settings takes on this machine (the best of runs)."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        _kdf(kdf, params, os.urandom(16)).derive(b"calibration")
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def calibrate_kdf(kdf: str, target_ms: float = UNLOCK_TARGET_MS) -> dict:
+    """Pick KDF parameters that make one unlock take about target_ms here.
+
+    The memory-hard settings (scrypt's n, Argon2's memory) are sized first and
+    the remaining time is made up with a cost that scales linearly: PBKDF2
+    iterations, scrypt's p or Argon2 passes. Never goes below the minimums
+    (KDF_ITERATIONS, scrypt n=2**15, Argon2 two passes over 19 MiB).
+    """
+    target = target_ms / 1000
+    if kdf == "pbkdf2-sha256":
+        elapsed = time_kdf(kdf, {"iterations": 100000}, runs=3)
+        return {"iterations": max(KDF_ITERATIONS, int(100000 * target / elapsed))}
+    if kdf == "scrypt":
+        params = {"n": 2**15, "r": 8, "p": 1}
+        elapsed = time_kdf(kdf, params)
+        # Each doubling of n doubles the time; stop before overshooting or exceeding the memory cap
+        while elapsed * 2 <= target and 128 * params["r"] * params["n"] * 2 <= SCRYPT_MAX_MEMORY:
+            params["n"] *= 2
+            elapsed = time_kdf(kdf, params)
+        params["p"] = max(1, round(target / time_kdf(kdf, params, runs=2)))
+        return params
+    if kdf == "argon2id":
+        params = {"iterations": 2, "lanes": ARGON2_LANES, "memory_cost": ARGON2_MEMORY_KIB}
+        per_pass = time_kdf(kdf, params, runs=2) / 2
+        if per_pass * 2 > target:
+            # Too slow even at two passes: use less memory, since time is roughly linear in it
+            params["memory_cost"] = max(19 * 1024, int(params["memory_cost"] * target / (per_pass * 2)))
+        else:
+            params["iterations"] = round(target / per_pass)
+        return params
+    raise ValueError(f"Unknown KDF: {kdf}")
+
+
+def vault_key(master_password: str) -> bytes:
+    salt, kdf, params = get_meta()
+    return derive_key(master_password, salt, kdf, params)
+
+
+def unlock_key(master_password: str) -> bytes:
+    """The vault's key, refusing while a key rotation is unfinished (entries are then under two keys)."""
+    if rotation_status() is not None:
+        raise RuntimeError("A key rotation is in progress; run 'rekey' or 'passwd' again to finish it.")
+    return vault_key(master_password)
+
+
 def open_vault(master_password: str):
-    salt, iterations = get_meta()
-    key = derive_key(master_password, salt, iterations)
-    return Fernet(key)
+    return Fernet(unlock_key(master_password))
 
 
-def add_entry(f: Fernet, name: str, username: str, password_plain: str, notes: str = ""):
+def check_master(f: Fernet, after_id: int = 0) -> bool:
+    """True if f decrypts the vault's first entry past after_id (an empty vault accepts any password)."""
+    conn = sqlite3.connect(DB_FILE)
+    row = conn.execute("SELECT password FROM entries WHERE id > ? ORDER BY id LIMIT 1", (after_id,)).fetchone()
+    conn.close()
+    if row is None:
+        return True
+    try:
+        f.decrypt(row[0])
+    except InvalidToken:
+        return False
+    return True
+
+
+def insert_entry(f: Fernet, name: str, username: str, password_plain: str, notes: str = "") -> int:
+    """Encrypt and store one entry; returns its id."""
     token = f.encrypt(password_plain.encode("utf-8"))
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
@@ -86,46 +303,115 @@ def add_entry(f: Fernet, name: str, username: str, password_plain: str, notes: s
     )
     conn.commit()
     conn.close()
+    return c.lastrowid
+
+
+def add_entry(f: Fernet, name: str, username: str, password_plain: str, notes: str = ""):
+    insert_entry(f, name, username, password_plain, notes)
     print(f"Entry '{name}' saved.")
 
 
-def get_entry(f: Fernet, entry_id: int):
+def fetch_entry(f: Fernet, entry_id: int):
+    """Return an entry as a dict with its password decrypted, or None if there is no such id.
+
+    Raises cryptography.fernet.InvalidToken when the key does not match.
+    """
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
     c.execute("SELECT id, name, username, password, notes, created_at FROM entries WHERE id = ?", (entry_id,))
     row = c.fetchone()
     conn.close()
     if not row:
-        print("Entry not found.")
-        return
+        return None
+    return {
+        "id": row[0],
+        "name": row[1],
+        "username": row[2],
+        "password": f.decrypt(row[3]).decode("utf-8"),
+        "notes": row[4],
+        "created_at": row[5],
+    }
+
+
+def print_entry(entry: dict):
+    print("----- Entry -----")
+    print(f"ID: {entry['id']}")
+    print(f"Name: {entry['name']}")
+    print(f"Username: {entry['username']}")
+    print(f"Password: {entry['password']}")
+    print(f"Notes: {entry['notes']}")
+    print(f"Created (UTC): {entry['created_at']}")
+    print("-----------------")
+
+
+def get_entry(f: Fernet, entry_id: int):
     try:
-        decrypted = f.decrypt(row[3]).decode("utf-8")
-    except Exception as e:
+        entry = fetch_entry(f, entry_id)
+    except InvalidToken:
         print("Decryption failed — wrong master password or corrupted data.")
         return
-    print("----- Entry -----")
-    print(f"ID: {row[0]}")
-    print(f"Name: {row[1]}")
-    print(f"Username: {row[2]}")
-    print(f"Password: {decrypted}")
-    print(f"Notes: {row[4]}")
-    print(f"Created (UTC): {row[5]}")
-    print("-----------------")
+    if entry is None:
+        print("Entry not found.")
+        return
+    print_entry(entry)
 
 
-def list_entries():
+def print_entry_rows(rows):
+    print("ID | Name | Username | Created (UTC)")
+    print("-" * 40)
+    for r in rows:
+        print(f"{r[0]:<3} {r[1]:<20} {r[2] or '-':<15} {r[3]}")
+
+
+def list_entries(limit: int = -1, offset: int = 0):
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
-    c.execute("SELECT id, name, username, created_at FROM entries ORDER BY id")
+    c.execute(
+        "SELECT id, name, username, created_at FROM entries ORDER BY id LIMIT ? OFFSET ?", (limit, offset)
+    )
     rows = c.fetchall()
     conn.close()
     if not rows:
-        print("No entries yet.")
+        print("No entries yet." if offset == 0 else "No more entries.")
         return
-    print("ID | Name | Username | Created (UTC)")
-    print("-" * 40)
-    for r in rows:
-        print(f"{r[0]:<3} {r[1]:<20} {r[2] or '-':<15} {r[3]}")
+    print_entry_rows(rows)
+
+
+def search_entries(query: str, limit: int = SEARCH_PAGE_SIZE, offset: int = 0) -> list:
+    """Look up entries by name or username without decrypting anything.
+
+    "git alice" finds an entry named GitHub with username alice@example.com:
+    each query word only has to start a word of the name or username. Returns
+    one page of (id, name, username, created_at) rows, closest matches first,
+    or in id order when SQLite lacks FTS5 and a LIKE scan is used instead.
+    """
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return []
+    conn = sqlite3.connect(DB_FILE)
+    if has_search_index(conn):
+        # Quoted so words such as "and" or "near" are not taken as FTS5 operators;
+        # each trailing * lets a partly typed word like "git" match "github"
+        match = " ".join(f'"{term}"*' for term in terms)
+        rows = conn.execute(
+            """
+            SELECT e.id, e.name, e.username, e.created_at
+            FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid
+            WHERE entries_fts MATCH ?
+            ORDER BY bm25(entries_fts), e.id
+            LIMIT ? OFFSET ?
+            """,
+            (match, limit, offset),
+        ).fetchall()
+    else:
+        patterns = ["%" + re.sub(r"([\\%_])", r"\\\1", term) + "%" for term in terms]
+        where = " AND ".join(["(name LIKE ? ESCAPE '\\' OR username LIKE ? ESCAPE '\\')"] * len(terms))
+        rows = conn.execute(
+            f"SELECT id, name, username, created_at FROM entries WHERE {where} ORDER BY id LIMIT ? OFFSET ?",
+            [pattern for pattern in patterns for _ in ("name", "username")] + [limit, offset],
+        ).fetchall()
+    conn.close()
+    return rows
 
 
 def delete_entry(entry_id: int):
@@ -141,6 +427,610 @@ def delete_entry(entry_id: int):
         print("Entry not found.")
 
 
+# ---------- Key rotation ----------
+# Changing the master password or KDF re-encrypts every entry in batches. Each
+# batch commits together with the rotation's progress, so after a crash the
+# vault holds entries up to rotation.last_id under the new key and the rest
+# under the old one, and running the command again picks up where it stopped.
+
+
+def rotation_status():
+    """Return the pending rotation as a dict, or None if no rotation is in progress."""
+    conn = sqlite3.connect(DB_FILE)
+    row = conn.execute("SELECT salt, kdf, kdf_params, verifier, last_id, started_at FROM rotation").fetchone()
+    conn.close()
+    if row is None:
+        return None
+    return {
+        "salt": row[0],
+        "kdf": row[1],
+        "params": json.loads(row[2]),
+        "verifier": row[3],
+        "last_id": row[4],
+        "started_at": row[5],
+    }
+
+
+def start_rotation(new_password: str, kdf: str, params: dict) -> bytes:
+    """Record a rotation to new_password under kdf/params with a fresh salt; returns the new key."""
+    salt = os.urandom(16)
+    key = derive_key(new_password, salt, kdf, params)
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute(
+        "INSERT INTO rotation (id, salt, kdf, kdf_params, verifier, last_id, started_at) "
+        "VALUES (1, ?, ?, ?, ?, 0, ?)",
+        (salt, kdf, json.dumps(params), Fernet(key).encrypt(b"rotation"),
+         datetime.datetime.utcnow().isoformat()),
+    )
+    conn.commit()
+    conn.close()
+    return key
+
+
+def rotation_key(status: dict, password: str):
+    """The pending rotation's key if password is its new password, else None."""
+    key = derive_key(password, status["salt"], status["kdf"], status["params"])
+    try:
+        Fernet(key).decrypt(status["verifier"])
+    except InvalidToken:
+        return None
+    return key
+
+
+def _reencrypt(old_key: bytes, new_key: bytes, tokens: list) -> list:
+    old_f, new_f = Fernet(old_key), Fernet(new_key)
+    return [new_f.encrypt(old_f.decrypt(token)) for token in tokens]
+
+
+def rotate_entries(old_key: bytes, new_key: bytes, batch_size: int = ROTATION_BATCH_SIZE,
+                   workers: int = None, progress=None) -> int:
+    """Re-encrypt every entry past the rotation's last_id; returns how many were done.
+
+    Entries are read in id order a batch at a time. Fernet is mostly Python
+    code that holds the GIL, so the crypto runs in worker processes, which
+    start on the next batch while the current one is written.
+    """
+    workers = workers or os.cpu_count() or 1
+    conn = sqlite3.connect(DB_FILE, isolation_level=None)
+    last_id = conn.execute("SELECT last_id FROM rotation").fetchone()[0]
+    total = conn.execute("SELECT COUNT(*) FROM entries WHERE id > ?", (last_id,)).fetchone()[0]
+    done = 0
+
+    def submit(pool, after_id):
+        rows = conn.execute(
+            "SELECT id, password FROM entries WHERE id > ? ORDER BY id LIMIT ?", (after_id, batch_size)
+        ).fetchall()
+        if not rows:
+            return None
+        step = -(-len(rows) // workers)
+        chunks = [[token for _, token in rows[i:i + step]] for i in range(0, len(rows), step)]
+        futures = [pool.submit(_reencrypt, old_key, new_key, chunk) for chunk in chunks]
+        return [entry_id for entry_id, _ in rows], futures
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = submit(pool, last_id)
+            while pending is not None:
+                ids, futures = pending
+                pending = submit(pool, ids[-1])
+                tokens = [token for future in futures for token in future.result()]
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("UPDATE entries SET password = ? WHERE id = ?", zip(tokens, ids))
+                conn.execute("UPDATE rotation SET last_id = ?", (ids[-1],))
+                conn.execute("COMMIT")
+                done += len(ids)
+                if progress:
+                    progress(done, total)
+    finally:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        conn.close()
+    return done
+
+
+def finish_rotation() -> bool:
+    """Make the rotation's key the vault's key. False if entries were added under the old key meanwhile."""
+    conn = sqlite3.connect(DB_FILE, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT salt, kdf, kdf_params, last_id FROM rotation").fetchone()
+        salt, kdf, params, last_id = row
+        if conn.execute("SELECT 1 FROM entries WHERE id > ? LIMIT 1", (last_id,)).fetchone():
+            conn.execute("ROLLBACK")
+            return False
+        iterations = json.loads(params).get("iterations") if kdf == "pbkdf2-sha256" else None
+        conn.execute(
+            "UPDATE meta SET salt = ?, kdf = ?, kdf_params = ?, kdf_iterations = ? WHERE id = 1",
+            (salt, kdf, params, iterations),
+        )
+        conn.execute("DELETE FROM rotation")
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return True
+
+
+def rotate(old_key: bytes, new_key: bytes, batch_size: int = ROTATION_BATCH_SIZE, workers: int = None,
+           progress=None) -> int:
+    """Re-encrypt the whole vault under new_key and switch to it; returns the entries re-encrypted."""
+    done = rotate_entries(old_key, new_key, batch_size, workers, progress)
+    while not finish_rotation():
+        done += rotate_entries(old_key, new_key, batch_size, workers, progress)
+    return done
+
+
+# ---------- Import / export ----------
+# Entries move in chunks of TRANSFER_CHUNK_SIZE, so neither side holds a whole
+# vault in memory, and the Fernet work for each chunk runs in worker processes.
+#
+# An export file is a JSON header line (format, KDF settings and salt for the
+# export passphrase) followed by one Fernet token per line. Each token holds a
+# chunk {"seq", "entries"}; a last {"seq", "end", "count"} token marks a
+# complete file, so dropped, reordered or truncated chunks are detected.
+
+
+def _chunks(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _parallel_map(function, calls, workers: int = None):
+    """Yield function(*args) for each args tuple in calls, in order, with a bounded number in flight."""
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        for args in calls:
+            pending.append(pool.submit(function, *args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _encrypt_rows(key: bytes, rows: list) -> list:
+    """(name, username, password, notes, created_at) rows with the passwords encrypted under key."""
+    f = Fernet(key)
+    return [(name, username, f.encrypt(password.encode("utf-8")), notes, created)
+            for name, username, password, notes, created in rows]
+
+
+def _seal_chunk(vault_key: bytes, export_key: bytes, seq: int, rows: list) -> bytes:
+    f = Fernet(vault_key)
+    entries = [[name, username, f.decrypt(token).decode("utf-8"), notes, created]
+               for name, username, token, notes, created in rows]
+    return Fernet(export_key).encrypt(json.dumps({"seq": seq, "entries": entries}).encode("utf-8"))
+
+
+def _open_chunk(export_key: bytes, vault_key: bytes, line: bytes) -> dict:
+    """Decrypt one export chunk and re-encrypt its passwords under vault_key for insertion."""
+    chunk = json.loads(Fernet(export_key).decrypt(line.strip()))
+    chunk["entries"] = _encrypt_rows(vault_key, chunk.get("entries", []))
+    return chunk
+
+
+def insert_rows(batches) -> int:
+    """Insert batches of encrypted (name, username, password, notes, created_at) rows in one transaction.
+
+    Either every row is stored or, if anything fails part way, none is.
+    """
+    conn = sqlite3.connect(DB_FILE, isolation_level=None)
+    count = 0
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for rows in batches:
+            conn.executemany(
+                "INSERT INTO entries (name, username, password, notes, created_at) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            count += len(rows)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return count
+
+
+def csv_entries(lines):
+    """Yield (name, username, password, notes, created_at) for each CSV row that has a password.
+
+    Columns are found by header name; rows without a name are named after
+    the host of their URL.
+    """
+    reader = csv.reader(lines)
+    header = [column.strip().lower() for column in next(reader, [])]
+    index = {}
+    for field, names in CSV_COLUMNS.items():
+        index[field] = next((header.index(name) for name in names if name in header), None)
+    if index["password"] is None:
+        raise ValueError("CSV has no password column")
+    created_at = datetime.datetime.utcnow().isoformat()
+
+    def value(row, field):
+        i = index[field]
+        return row[i].strip() if i is not None and i < len(row) else ""
+
+    for row in reader:
+        password = row[index["password"]] if index["password"] < len(row) else ""
+        if not password:
+            continue
+        url = value(row, "url")
+        name = value(row, "name") or urlparse(url).hostname or url or "(unnamed)"
+        yield name, value(row, "username"), password, value(row, "notes"), created_at
+
+
+def import_csv(key: bytes, path: str, workers: int = None, chunk_size: int = TRANSFER_CHUNK_SIZE) -> int:
+    """Import a browser/password manager CSV export; returns the number of entries added."""
+    with open(path, newline="", encoding="utf-8-sig") as source:
+        calls = ((key, rows) for rows in _chunks(csv_entries(source), chunk_size))
+        return insert_rows(_parallel_map(_encrypt_rows, calls, workers))
+
+
+def read_export_header(path: str):
+    """The header of an export file, or None if path is not one."""
+    with open(path, "rb") as source:
+        try:
+            header = json.loads(source.readline())
+        except ValueError:
+            return None
+    return header if isinstance(header, dict) and header.get("format") == EXPORT_FORMAT else None
+
+
+def export_vault(key: bytes, path: str, passphrase: str, workers: int = None,
+                 chunk_size: int = TRANSFER_CHUNK_SIZE) -> int:
+    """Write every entry to an export file encrypted with passphrase; returns the number exported.
+
+    The passphrase key uses the vault's KDF settings with a fresh salt. The
+    file is written beside path and renamed into place once complete.
+    """
+    _, kdf, params = get_meta()
+    salt = os.urandom(16)
+    export_key = derive_key(passphrase, salt, kdf, params)
+    header = {"format": EXPORT_FORMAT, "version": EXPORT_VERSION, "kdf": kdf, "kdf_params": params,
+              "salt": base64.b64encode(salt).decode("ascii")}
+    conn = sqlite3.connect(DB_FILE, isolation_level=None)
+    count = seq = 0
+
+    def calls():
+        nonlocal count
+        # One read transaction, so the export is a consistent snapshot even if entries change meanwhile
+        conn.execute("BEGIN")
+        cursor = conn.execute("SELECT name, username, password, notes, created_at FROM entries ORDER BY id")
+        for seq, rows in enumerate(_chunks(cursor, chunk_size)):
+            count += len(rows)
+            yield key, export_key, seq, rows
+
+    partial = path + ".partial"
+    try:
+        with open(os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as out:
+            out.write(json.dumps(header).encode("utf-8") + b"\n")
+            for seq, token in enumerate(_parallel_map(_seal_chunk, calls(), workers), start=1):
+                out.write(token + b"\n")
+            end = json.dumps({"seq": seq, "end": True, "count": count}).encode("utf-8")
+            out.write(Fernet(export_key).encrypt(end) + b"\n")
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        raise
+    finally:
+        conn.close()
+    return count
+
+
+def import_export(key: bytes, path: str, passphrase: str, workers: int = None) -> int:
+    """Add every entry of an export file to the vault; returns the number imported.
+
+    Raises InvalidToken for a wrong passphrase or tampered chunk, and
+    ValueError for a file that is incomplete or out of order. Nothing is
+    stored unless the whole file checks out.
+    """
+    header = read_export_header(path)
+    if header is None or header.get("version") != EXPORT_VERSION:
+        raise ValueError(f"{path} is not a version {EXPORT_VERSION} vault export")
+    export_key = derive_key(passphrase, base64.b64decode(header["salt"]), header["kdf"], header["kdf_params"])
+
+    def batches():
+        with open(path, "rb") as source:
+            source.readline()
+            calls = ((export_key, key, line) for line in source if line.strip())
+            expected = count = 0
+            for chunk in _parallel_map(_open_chunk, calls, workers):
+                if chunk["seq"] != expected:
+                    raise ValueError(f"export chunk {expected} is missing or out of order")
+                if chunk.get("end"):
+                    if chunk["count"] != count:
+                        raise ValueError(f"export holds {count} entries, expected {chunk['count']}")
+                    return
+                expected += 1
+                count += len(chunk["entries"])
+                yield chunk["entries"]
+        raise ValueError("export is truncated")
+
+    return insert_rows(batches())
+
+
+# ---------- Key agent ----------
+# Like ssh-agent: one process derives the key once and keeps it in memory, so
+# scripted lookups skip the KDF. Requests and replies are single JSON lines.
+
+
+def agent_socket_path() -> str:
+    """The agent's socket: $VAULT_AGENT_SOCK, or a per-user path in the temp directory."""
+    path = os.environ.get("VAULT_AGENT_SOCK")
+    if path:
+        return path
+    return os.path.join(tempfile.gettempdir(), f"vault-agent-{os.getuid()}", "agent.sock")
+
+
+def check_agent_dir(path: str):
+    """Raise RuntimeError unless path is a real directory owned by this user and closed to everyone else.
+
+    The default socket lives at a predictable name in a shared temp directory,
+    so another user could create the directory first and listen in it.
+    """
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        raise RuntimeError(f"{path} is not a directory")
+    if st.st_uid != os.getuid():
+        raise RuntimeError(f"{path} is owned by uid {st.st_uid}, not by you")
+    if stat.S_IMODE(st.st_mode) != 0o700:
+        raise RuntimeError(f"{path} has mode {stat.S_IMODE(st.st_mode):o}; it must be 700")
+
+
+def peer_uid(sock: socket.socket):
+    """The uid of the process at the other end of a Unix socket, or None without SO_PEERCRED."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid
+
+
+class _AgentRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            reply = self.server.dispatch(json.loads(self.rfile.readline()))
+        except InvalidToken:
+            reply = {"ok": False, "error": "decryption failed"}
+        except Exception as e:
+            reply = {"ok": False, "error": str(e)}
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+class VaultAgent(socketserver.UnixStreamServer):
+    """Holds an unlocked vault's key and serves get/add requests on a Unix socket until idle."""
+
+    def __init__(self, f: Fernet, socket_path: str, idle_timeout: float = AGENT_IDLE_TIMEOUT):
+        self.fernet = f
+        self.vault = os.path.abspath(DB_FILE)
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.last_used = time.monotonic()
+        self.stopping = False
+        self.timeout = 1  # handle_request() returns every second so the idle timer is checked
+
+        socket_dir = os.path.dirname(socket_path) or "."
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        check_agent_dir(socket_dir)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # left behind by an agent that did not exit cleanly
+        # The socket is created owner-only; there is no window where others could connect
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _AgentRequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def verify_request(self, request, client_address):
+        # On Linux, also check the peer's uid rather than trusting file permissions alone
+        return peer_uid(request) in (None, os.getuid())
+
+    def dispatch(self, request: dict) -> dict:
+        self.last_used = time.monotonic()
+        if request.get("vault") != self.vault:
+            return {"ok": False, "error": f"agent holds the key for {self.vault}"}
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "lock":
+            self.stopping = True
+            return {"ok": True}
+        return serve_request(self.fernet, request)
+
+    def serve_until_idle(self):
+        try:
+            while not self.stopping and time.monotonic() - self.last_used < self.idle_timeout:
+                self.handle_request()
+        finally:
+            self.fernet = None
+            self.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+def agent_request(request: dict, timeout: float = 5.0):
+    """Send one request to the running agent; returns its reply, or None if no agent is listening.
+
+    An agent whose socket directory or process belongs to someone else is
+    warned about and treated as absent, so no request (which may hold a
+    plaintext password) reaches it.
+    """
+    payload = json.dumps({**request, "vault": os.path.abspath(DB_FILE)}).encode("utf-8") + b"\n"
+    path = agent_socket_path()
+    try:
+        check_agent_dir(os.path.dirname(path) or ".")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            if peer_uid(sock) not in (None, os.getuid()):
+                raise RuntimeError(f"{path} is served by uid {peer_uid(sock)}, not by you")
+            sock.sendall(payload)
+            reply = sock.makefile("rb").readline()
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    except RuntimeError as e:
+        print(f"Ignoring vault agent: {e}", file=sys.stderr)
+        return None
+    return json.loads(reply) if reply else None
+
+
+def unlock_key_interactive():
+    """Prompt for the master password and return the vault's key, or None if it is wrong."""
+    init_db()
+    try:
+        key = unlock_key(getpass.getpass("Enter master password: "))
+    except RuntimeError as e:
+        print(e)
+        return None
+    if not check_master(Fernet(key)):
+        print("Wrong master password.")
+        return None
+    return key
+
+
+def unlock_interactive():
+    """Prompt for the master password and return the vault's Fernet, or None if it is wrong."""
+    key = unlock_key_interactive()
+    return None if key is None else Fernet(key)
+
+
+def start_agent(idle_timeout: float = AGENT_IDLE_TIMEOUT, foreground: bool = False):
+    """Unlock the vault once and serve it from a background process until idle_timeout passes unused."""
+    if agent_request({"op": "ping"}) is not None:
+        print(f"An agent is already listening on {agent_socket_path()}.")
+        return
+    f = unlock_interactive()
+    if f is None:
+        return
+    try:
+        agent = VaultAgent(f, agent_socket_path(), idle_timeout)
+    except RuntimeError as e:
+        print(f"Cannot start the agent: {e}")
+        return
+    if not foreground:
+        if os.fork():
+            agent.socket.close()
+            print(f"Vault agent started on {agent.socket_path} (idle timeout {idle_timeout:g}s).")
+            return
+        # Detach from the terminal like a daemon
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+    agent.serve_until_idle()
+
+
+def serve_request(f: Fernet, request: dict) -> dict:
+    """Carry out one get/add request with an unlocked vault; the agent and the local fallback share it."""
+    op = request.get("op")
+    if op == "get":
+        return {"ok": True, "entry": fetch_entry(f, int(request["id"]))}
+    if op == "add":
+        entry_id = insert_entry(
+            f, request["name"], request.get("username", ""), request["password"], request.get("notes", "")
+        )
+        return {"ok": True, "id": entry_id}
+    return {"ok": False, "error": f"unknown request: {op}"}
+
+
+def run_request(request: dict) -> dict:
+    """Send a request to the agent, or unlock the vault here (paying for the KDF) when none is running."""
+    reply = agent_request(request)
+    if reply is not None:
+        return reply
+    f = unlock_interactive()
+    if f is None:
+        return {"ok": False, "error": "wrong master password"}
+    try:
+        return serve_request(f, request)
+    except InvalidToken:
+        return {"ok": False, "error": "decryption failed"}
+
+
+def rotate_interactive(kdf: str, target_ms: float, change_password: bool = False,
+                       batch_size: int = ROTATION_BATCH_SIZE, workers: int = None) -> bool:
+    """Re-encrypt the vault under a freshly calibrated kdf, optionally with a new master password.
+
+    If an earlier rotation was interrupted, finishes that one instead (its
+    KDF settings and new password are kept).
+    """
+    init_db()
+    status = rotation_status()
+    if status is not None:
+        print(f"Resuming the key rotation started at {status['started_at']} (UTC).")
+    master = getpass.getpass("Enter master password: ")
+    old_key = vault_key(master)
+    if not check_master(Fernet(old_key), status["last_id"] if status else 0):
+        print("Wrong master password.")
+        return False
+
+    if status is not None:
+        # A rekey kept the same password; a password change needs the new one again
+        new_key = rotation_key(status, master) or rotation_key(status, getpass.getpass("New master password: "))
+        if new_key is None:
+            print("That is not the new master password of the interrupted rotation.")
+            return False
+        kdf, params = status["kdf"], status["params"]
+    else:
+        new_password = master
+        if change_password:
+            new_password = getpass.getpass("New master password: ")
+            if new_password != getpass.getpass("Repeat new master password: "):
+                print("Passwords do not match.")
+                return False
+        params = calibrate_kdf(kdf, target_ms)
+        # A running agent holds the old key and could add entries under it
+        agent_request({"op": "lock"})
+        new_key = start_rotation(new_password, kdf, params)
+
+    def progress(done, total):
+        print(f"\rRe-encrypted {done}/{total} entries", end="", flush=True)
+
+    done = rotate(old_key, new_key, batch_size, workers, progress)
+    if done:
+        print()
+    print(f"Vault re-keyed with {kdf} {json.dumps(params)}.")
+    return True
+
+
+def transfer_interactive(command: str, path: str, workers: int = None) -> bool:
+    """Run an export, or an import from a backup or CSV file, prompting for the passwords it needs."""
+    key = unlock_key_interactive()
+    if key is None:
+        return False
+    try:
+        if command == "export":
+            passphrase = getpass.getpass("Backup passphrase: ")
+            if passphrase != getpass.getpass("Repeat backup passphrase: "):
+                print("Passphrases do not match.")
+                return False
+            count = export_vault(key, path, passphrase, workers)
+            print(f"Exported {count} entries to {path}.")
+            return True
+        if read_export_header(path) is not None:
+            count = import_export(key, path, getpass.getpass("Backup passphrase: "), workers)
+        else:
+            count = import_csv(key, path, workers)
+    except InvalidToken:
+        print("Decryption failed — wrong backup passphrase or corrupted file.")
+        return False
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"{command.capitalize()} failed: {e}")
+        return False
+    print(f"Imported {count} entries from {path}.")
+    return True
+
+
 def interactive_menu():
     print("Simple Password Manager — local vault")
     init_db()
@@ -158,7 +1048,8 @@ def interactive_menu():
         print("2) Get entry (by id)")
         print("3) List entries")
         print("4) Delete entry (by id)")
-        print("5) Quit")
+        print("5) Search entries (by name or username)")
+        print("6) Quit")
         choice = input("> ").strip()
         if choice == "1":
             name = input("Name (e.g. 'Gmail'): ").strip()
@@ -187,11 +1078,125 @@ def interactive_menu():
             else:
                 print("Cancelled.")
         elif choice == "5":
+            query = input("Search: ").strip()
+            offset = 0
+            while True:
+                rows = search_entries(query, SEARCH_PAGE_SIZE, offset)
+                if not rows:
+                    print("No matches." if offset == 0 else "No more matches.")
+                    break
+                print_entry_rows(rows)
+                offset += len(rows)
+                if len(rows) < SEARCH_PAGE_SIZE or input("More? [y/N]: ").lower() != "y":
+                    break
+        elif choice == "6":
             print("Goodbye.")
             break
         else:
             print("Unknown option.")
 
 
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        interactive_menu()
+        return 0
+
+    parser = argparse.ArgumentParser(
+        description="Local password vault. Run without arguments for the interactive menu."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    agent = commands.add_parser("agent", help="unlock once and keep the key in a background agent")
+    agent.add_argument(
+        "--timeout", type=float, default=AGENT_IDLE_TIMEOUT, help="idle seconds before the agent exits"
+    )
+    agent.add_argument("--foreground", action="store_true", help="serve without detaching")
+    commands.add_parser("lock", help="stop the running agent")
+    get = commands.add_parser("get", help="show one entry")
+    get.add_argument("id", type=int)
+    get.add_argument("--password-only", action="store_true", help="print only the password, for scripts")
+    add = commands.add_parser("add", help="add an entry (password read from stdin when it is not a terminal)")
+    add.add_argument("name")
+    add.add_argument("--username", default="")
+    add.add_argument("--notes", default="")
+    for name, help_text in (("list", "list entries, a page at a time"),
+                            ("search", "find entries by name or username (the last word may be a prefix)")):
+        command = commands.add_parser(name, help=help_text)
+        if name == "search":
+            command.add_argument("query")
+        command.add_argument("--limit", type=int, default=SEARCH_PAGE_SIZE, help="entries per page")
+        command.add_argument("--page", type=int, default=1)
+    export = commands.add_parser("export", help="write an encrypted backup of every entry")
+    export.add_argument("file")
+    export.add_argument("--workers", type=int, help="encryption processes (default: one per CPU)")
+    import_ = commands.add_parser("import", help="add entries from a backup or a browser/CSV password export")
+    import_.add_argument("file")
+    import_.add_argument("--workers", type=int, help="encryption processes (default: one per CPU)")
+    for name, help_text in (("calibrate", "time KDF settings for a target unlock latency on this machine"),
+                            ("rekey", "move the vault to a (re)calibrated KDF, re-encrypting every entry"),
+                            ("passwd", "change the master password, re-encrypting every entry")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--kdf", choices=KDFS, default=default_kdf())
+        command.add_argument("--target-ms", type=float, default=UNLOCK_TARGET_MS, help="desired unlock time")
+        if name != "calibrate":
+            command.add_argument("--batch-size", type=int, default=ROTATION_BATCH_SIZE,
+                                 help="entries per commit")
+            command.add_argument("--workers", type=int, help="encryption processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    if args.command in ("list", "search"):
+        init_db()
+        offset = (args.page - 1) * args.limit
+        if args.command == "list":
+            list_entries(args.limit, offset)
+            return 0
+        rows = search_entries(args.query, args.limit, offset)
+        if not rows:
+            print("No matches.", file=sys.stderr)
+            return 1
+        print_entry_rows(rows)
+        return 0
+    if args.command in ("export", "import"):
+        return 0 if transfer_interactive(args.command, args.file, args.workers) else 1
+    if args.command == "calibrate":
+        params = calibrate_kdf(args.kdf, args.target_ms)
+        print(f"{args.kdf} {json.dumps(params)}: {time_kdf(args.kdf, params) * 1000:.0f} ms per unlock")
+        return 0
+    if args.command in ("rekey", "passwd"):
+        change_password = args.command == "passwd"
+        rotated = rotate_interactive(args.kdf, args.target_ms, change_password, args.batch_size, args.workers)
+        return 0 if rotated else 1
+    if args.command == "agent":
+        start_agent(args.timeout, args.foreground)
+        return 0
+    if args.command == "lock":
+        if agent_request({"op": "lock"}) is None:
+            print("No agent is running.")
+        return 0
+
+    if args.command == "get":
+        reply = run_request({"op": "get", "id": args.id})
+    else:
+        if sys.stdin.isatty():
+            password = getpass.getpass("Password (will not be shown): ")
+        else:
+            password = sys.stdin.readline().rstrip("\n")
+        reply = run_request({"op": "add", "name": args.name, "username": args.username,
+                             "password": password, "notes": args.notes})
+    if not reply["ok"]:
+        print(f"Error: {reply['error']}", file=sys.stderr)
+        return 1
+    if args.command == "add":
+        print(f"Entry '{args.name}' saved (id {reply['id']}).")
+    elif reply["entry"] is None:
+        print("Entry not found.", file=sys.stderr)
+        return 1
+    elif args.password_only:
+        print(reply["entry"]["password"])
+    else:
+        print_entry(reply["entry"])
+    return 0
+
+
 if __name__ == "__main__":
-    interactive_menu()
+    sys.exit(main())
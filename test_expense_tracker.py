@@ -0,0 +1,65 @@
+"""Query plan and report cache checks for ExpenseTracker.
+
+    python -m pytest test_expense_tracker.py
+"""
+import threading
+
+import pytest
+
+from expense_tracker import ExpenseTracker
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    with ExpenseTracker(str(tmp_path / 'expenses.db'), verbose=False) as tracker:
+        yield tracker
+
+
+def test_schema_is_fully_migrated(tracker):
+    version = tracker._connect().execute("PRAGMA user_version").fetchone()[0]
+    assert version == len(ExpenseTracker.MIGRATIONS)
+
+
+def test_date_range_read_searches_date_index(tracker):
+    query, params = tracker._expenses_query('2024-01-01', '2024-01-31', None, ())
+    plan = tracker.explain(query, params)
+    assert any('USING INDEX idx_expenses_date_category_amount' in step for step in plan), plan
+    assert not any(step.startswith('SCAN expenses') for step in plan), plan
+
+
+def test_report_columns_are_covered_by_date_index(tracker):
+    query, params = tracker._expenses_query('2024-01-01', '2024-01-31', ['date', 'category', 'amount_cents'], ())
+    plan = tracker.explain(query, params)
+    assert any('USING COVERING INDEX idx_expenses_date_category_amount' in step for step in plan), plan
+
+
+def test_budget_upsert_key_is_a_unique_index(tracker):
+    conn = tracker._connect()
+    unique = {name for _, name, is_unique, *_ in conn.execute("PRAGMA index_list(budgets)") if is_unique}
+    assert 'idx_budgets_month_category' in unique
+    columns = [row[2] for row in conn.execute("PRAGMA index_info(idx_budgets_month_category)")]
+    assert columns == ['month_year', 'category']
+
+
+def test_set_budget_updates_in_place(tracker):
+    assert tracker.set_budget('Travel', 100, '2024-01')
+    assert tracker.set_budget('Travel', 250, '2024-01')
+    rows = tracker._connect().execute(
+        "SELECT amount_cents FROM budgets WHERE category = 'Travel' AND month_year = '2024-01'"
+    ).fetchall()
+    assert rows == [(25000,)]
+
+
+def test_nested_write_invalidates_cache_after_outer_commit(tracker):
+    def summary_total():
+        summary = tracker.get_monthly_summary(2024, 1)
+        return 0 if summary is None else summary['Total Amount'].sum()
+
+    tracker.add_expense(10, 'Travel', date='2024-01-05')
+    with tracker.transaction():
+        tracker.add_expense(5, 'Travel', date='2024-01-06')
+        # Another thread still sees, and caches, the committed total
+        reader = threading.Thread(target=summary_total)
+        reader.start()
+        reader.join()
+    assert summary_total() == 15
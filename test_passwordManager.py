@@ -0,0 +1,30 @@
+"""Search checks for passwordManager's vault.
+
+    python -m pytest test_passwordManager.py
+"""
+import pytest
+from cryptography.fernet import Fernet
+
+import passwordManager as pm
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    monkeypatch.setattr(pm, "DB_FILE", str(tmp_path / "vault.db"))
+    # Skip the unlock-time calibration; these tests never derive a key
+    monkeypatch.setattr(pm, "calibrate_kdf", lambda kdf, target_ms=pm.UNLOCK_TARGET_MS: {})
+    pm.init_db()
+    f = Fernet(Fernet.generate_key())
+    pm.insert_entry(f, "GitHub", "alice@example.com", "secret")
+    pm.insert_entry(f, "GitLab", "bob@example.com", "secret")
+    return f
+
+
+def test_every_search_word_matches_as_a_prefix(vault):
+    assert [row[1] for row in pm.search_entries("git alice")] == ["GitHub"]
+    assert [row[1] for row in pm.search_entries("gi al")] == ["GitHub"]
+
+
+def test_search_needs_every_word(vault):
+    assert sorted(row[1] for row in pm.search_entries("git")) == ["GitHub", "GitLab"]
+    assert pm.search_entries("git carol") == []